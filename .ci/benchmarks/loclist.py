@@ -0,0 +1,124 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Compares the time Vim takes to build a location list from the Ex commands
+generated by toVimDict (one dict at a time) and by toVimList (single
+json_decode call). Commands are recorded and then run by a headless Vim, so
+the time measured includes Vim parsing and executing them.
+
+Usage: python3 .ci/benchmarks/loclist.py [number of messages ...]
+"""
+
+import os.path as p
+import shutil
+import subprocess as subp
+import sys
+import tempfile
+import time
+
+try:  # Python 3.x
+    import unittest.mock as mock  # pylint: disable=import-error, no-name-in-module
+except ImportError:  # Python 2.x
+    import mock
+
+sys.path.insert(0, p.abspath(p.join(p.dirname(__file__), "..", "..", "python")))
+sys.modules["vim"] = mock.MagicMock()
+
+# pylint: disable=import-error,wrong-import-position
+import vim  # type: ignore
+import vimhdl.vim_helpers as vim_helpers
+
+# pylint: enable=import-error,wrong-import-position
+
+
+def _messages(count):
+    return [
+        {
+            "lnum": i + 1,
+            "bufnr": "1",
+            "filename": "/some/path/to/file.vhd",
+            "valid": "1",
+            "text": "signal 'foo_%d' is never used, \"bar\" is" % i,
+            "nr": "0",
+            "type": "W",
+            "col": 5,
+            "subtype": "Style",
+        }
+        for i in range(count)
+    ]
+
+
+def _record(messages, has_json_decode):
+    "Returns the Ex commands toVimList generates"
+    commands = []
+    vim.command = commands.append
+    vim_helpers._HAS_JSON_DECODE = has_json_decode  # pylint: disable=protected-access
+    start = time.time()
+    vim_helpers.toVimList(messages, "l:loclist")
+    return commands, time.time() - start
+
+
+def _runInVim(vim_path, commands):
+    "Returns how long Vim takes to run commands within a function"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        script = p.join(tmp_dir, "script.vim")
+        result = p.join(tmp_dir, "result")
+        with open(script, "w") as fd:
+            fd.write(
+                "\n".join(
+                    ["function! Benchmark() abort", "let l:loclist = []"]
+                    + ["let l:start = reltime()"]
+                    + commands
+                    + [
+                        "call writefile([reltimestr(reltime(l:start)), "
+                        "len(l:loclist)], '%s')" % result,
+                        "endfunction",
+                        "call Benchmark()",
+                        "qall!",
+                        "",
+                    ]
+                )
+            )
+        subp.run([vim_path, "-Nu", "NONE", "-es", "-S", script], timeout=600)
+        with open(result) as fd:
+            elapsed, length = fd.read().split()
+        return float(elapsed), int(length)
+
+
+def main():
+    vim_path = shutil.which("vim")
+    if vim_path is None:
+        sys.exit("Vim is required to run this benchmark")
+
+    counts = [int(x) for x in sys.argv[1:]] or [100, 2000, 20000]
+
+    print(
+        "%8s  %-12s %10s %10s %10s"
+        % ("messages", "path", "commands", "python", "vim")
+    )
+    for count in counts:
+        messages = _messages(count)
+        for name, has_json_decode in (("toVimDict", False), ("json_decode", True)):
+            commands, python_time = _record(messages, has_json_decode)
+            vim_time, length = _runInVim(vim_path, commands)
+            assert length == count
+            print(
+                "%8d  %-12s %10d %9.3fs %9.3fs"
+                % (count, name, len(commands), python_time, vim_time)
+            )
+
+
+if __name__ == "__main__":
+    main()
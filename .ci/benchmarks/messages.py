@@ -0,0 +1,134 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Compares the time taken to turn decoded server messages into sorted location
+list dicts by the previous implementation (a dict per message, eager
+pformat() logging and a separate pass to parse numbers before sorting) and
+by LoclistEntry.
+
+Usage: python3 .ci/benchmarks/messages.py [number of messages ...]
+"""
+
+import logging
+import os.path as p
+import random
+import sys
+import time
+from pprint import pformat
+
+try:  # Python 3.x
+    import unittest.mock as mock  # pylint: disable=import-error, no-name-in-module
+except ImportError:  # Python 2.x
+    import mock
+
+sys.path.insert(0, p.abspath(p.join(p.dirname(__file__), "..", "..", "python")))
+# vimhdl's __init__ imports the client, which needs Vim
+sys.modules["vim"] = mock.MagicMock()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl.loclist import LoclistEntry, sortEntries
+
+# pylint: enable=import-error,wrong-import-position
+
+_logger = logging.getLogger(__name__)
+
+
+def _messages(count):
+    rand = random.Random(count)
+    return [
+        {
+            "line_number": rand.randint(0, count),
+            "column_number": rand.randint(0, 80),
+            "text": "signal 'foo_%d' is never used" % i,
+            "severity": rand.choice(("W", "E")),
+            "error_code": rand.choice((None, "123", "E1")),
+            "error_subtype": "Style",
+            "filename": None,
+        }
+        for i in range(count)
+    ]
+
+
+def _sortKey(record):
+    return (
+        1 if "Error" in record["type"] else 2,
+        record["lnum"] if isinstance(record["lnum"], int) else 0,
+        record["col"] if isinstance(record["col"], int) else 0,
+        record["nr"] if isinstance(record["nr"], int) else 0,
+    )
+
+
+def _previous(messages):
+    "Pipeline as implemented by VimhdlClient.getMessages before LoclistEntry"
+    records = []
+    for msg in messages:
+        _logger.info("msg:\n%s", pformat(msg))
+        text = str(msg["text"]) if msg["text"] else ""
+        vim_fmt_dict = {
+            "lnum": int(msg.get("line_number", 0)) + 1,
+            "bufnr": "1",
+            "filename": msg.get("filename", None) or "foo.vhd",
+            "valid": "1",
+            "text": text,
+            "nr": msg.get("error_code", None) or "0",
+            "type": msg.get("severity", None) or "E",
+            "col": int(msg.get("column_number", 0)) + 1,
+        }
+        try:
+            vim_fmt_dict["subtype"] = str(msg["error_subtype"])
+        except KeyError:
+            pass
+        _logger.info(vim_fmt_dict)
+        records.append(vim_fmt_dict)
+
+    for record in records:
+        for key in ("lnum", "nr", "col"):
+            try:
+                record[key] = int(record[key])
+            except ValueError:
+                pass
+    records.sort(key=_sortKey)
+    return records
+
+
+def _current(messages):
+    entries = sortEntries(
+        [LoclistEntry.fromMessage(msg, "1", "foo.vhd") for msg in messages]
+    )
+    return [x.toDict() for x in entries]
+
+
+def main():
+    # Same as Vim's default, logging is disabled for vimhdl's loggers
+    logging.basicConfig(level=logging.WARNING)
+    counts = [int(x) for x in sys.argv[1:]] or [1000, 10000, 100000]
+
+    print("%8s %10s %10s %8s" % ("messages", "previous", "current", "speedup"))
+    for count in counts:
+        messages = _messages(count)
+        results = []
+        for func in (_previous, _current):
+            start = time.time()
+            result = func(messages)
+            results.append((time.time() - start, result))
+        assert results[0][1] == results[1][1]
+        print(
+            "%8d %9.3fs %9.3fs %7.1fx"
+            % (count, results[0][0], results[1][0], results[0][0] / results[1][0])
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,531 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import json
+import logging
+import os.path as p
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs
+
+from nose2.tools import such
+
+try:  # Python 3.x
+    import unittest.mock as mock # pylint: disable=import-error, no-name-in-module
+except ImportError:  # Python 2.x
+    import mock
+
+_logger = logging.getLogger(__name__)
+
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), "..", ".."))
+    for path in (p.join(base_path, "python"),):
+        assert p.exists(path), "Path '%s' doesn't exists!" % path
+        sys.path.insert(0, path)
+
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.base_requests import (
+    BaseRequest,
+    BatchRequest,
+    GetDependencies,
+    RequestMessagesByContent,
+    RequestMessagesByPaths,
+    RequestQueuedMessages,
+    SubscribeEvents,
+)
+from vimhdl.wire_format import COMPRESS_THRESHOLD, FORM, JSON
+
+# pylint: enable=import-error,wrong-import-position
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Replies to every POST with the method and payload received
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super(_Handler, self).setup()
+        self.server.sockets.append(self.request)
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        self.server.connections.add(self.client_address)
+        self.server.paths.append(self.path)
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.encodings.append(self.headers.get("Content-Encoding", None))
+        if self.headers.get("Content-Encoding", None) == "deflate":
+            if not self.server.inflates_requests:
+                self.send_error(400)
+                return
+            body = zlib.decompress(body)
+        body = body.decode()
+
+        if self.headers.get("Content-Type", None) == "application/json":
+            if not self.server.accepts_json:
+                self.send_error(415)
+                return
+            body = json.loads(body)
+
+        if self.path == "/subscribe_events":
+            self._pushEvents()
+            return
+
+        if self.path == "/get_messages_by_content" and not self.server.checks_content:
+            self.send_error(404)
+            return
+
+        if self.path == "/get_messages_by_paths":
+            if not self.server.supports_multiple_paths:
+                self.send_error(404)
+                return
+            if isinstance(body, dict):
+                paths = body["paths"]
+            else:
+                paths = json.loads(parse_qs(body)["paths"][0])
+            content = {"messages_by_path": {x: [{"path": x}] for x in paths}}
+        elif self.path == "/get_diagnose_info" and self.server.lists_formats:
+            content = {"info": [], "wire_formats": ["form"]}
+            if self.server.accepts_json:
+                content["wire_formats"] += ["json"]
+            if self.server.inflates_requests:
+                content["request_encodings"] = ["deflate"]
+        elif self.path == "/batch":
+            if not self.server.supports_batch:
+                self.send_error(404)
+                return
+            if isinstance(body, dict):
+                calls = body["calls"]
+            else:
+                calls = json.loads(parse_qs(body)["calls"][0])
+            content = {
+                "responses": [
+                    {"path": "/" + x["method"], "payload": x["payload"]} for x in calls
+                ]
+            }
+        else:
+            content = {"path": self.path, "payload": body}
+
+        content = json.dumps(content).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _pushEvents(self):
+        "Streams server.events as newline delimited JSON, split across chunks"
+        if not self.server.pushes_events:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        data = "".join(json.dumps(x) + "\n" for x in self.server.events).encode()
+        for i in range(0, len(data), 7):
+            chunk = data[i : i + 7]
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def address_string(self):
+        return str(self.client_address)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+# http.server.ThreadingHTTPServer is only available on Python 3.7+
+class _HTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def _startServer(port=0, socket_path=None):
+    if socket_path is None:
+        server = _HTTPServer(("localhost", port), _Handler)
+    else:
+        server = _UnixHTTPServer(socket_path, _Handler)
+    server.daemon_threads = True
+    server.connections = set()
+    server.sockets = []
+    server.paths = []
+    server.supports_batch = True
+    server.accepts_json = True
+    server.lists_formats = True
+    server.pushes_events = True
+    server.supports_multiple_paths = True
+    server.checks_content = True
+    server.inflates_requests = True
+    server.encodings = []
+    server.events = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _stopServer(server):
+    "Stops the server and drops connections kept alive like a dead process would"
+    server.shutdown()
+    server.server_close()
+    for sock in server.sockets:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+with such.A("base requests module") as it:
+
+    @it.has_setup
+    def setup():
+        it.server = _startServer()
+        BaseRequest.setServerAddress("localhost", it.server.server_port)
+
+    @it.has_teardown
+    def teardown():
+        BaseRequest.resetConnections()
+        _stopServer(it.server)
+
+    @it.should("post the payload to the request method")
+    def test():
+        response = RequestQueuedMessages(project_file="foo.prj").sendRequest()
+        it.assertEqual(response.json()["path"], "/get_ui_messages")
+        it.assertEqual(response.json()["payload"], "project_file=foo.prj")
+
+    @it.should("reuse the same connection for consecutive requests")
+    def test():
+        it.server.connections.clear()
+        for _ in range(10):
+            it.assertIsNotNone(RequestQueuedMessages(project_file="").sendRequest())
+        it.assertEqual(len(it.server.connections), 1)
+
+    @it.should("reconnect when the server is restarted")
+    def test():
+        it.assertIsNotNone(RequestQueuedMessages(project_file="").sendRequest())
+        port = it.server.server_port
+        _stopServer(it.server)
+        it.server = _startServer(port)
+        it.assertIsNotNone(RequestQueuedMessages(project_file="").sendRequest())
+
+    @it.should("return None when the server can't be reached")
+    def test():
+        _stopServer(it.server)
+        try:
+            it.assertIsNone(RequestQueuedMessages(project_file="").sendRequest())
+        finally:
+            it.server = _startServer()
+            BaseRequest.setServerAddress("localhost", it.server.server_port)
+
+    @it.should("return None when sending fails unexpectedly")
+    def test():
+        async def post():
+            raise RuntimeError("foo")
+
+        request = RequestQueuedMessages(project_file="")
+        with mock.patch.object(request, "_post", post):
+            it.assertIsNone(request.sendRequest())
+
+    @it.should("check optional endpoints again when the server changes")
+    def test():
+        optional = (
+            BatchRequest,
+            RequestMessagesByContent,
+            RequestMessagesByPaths,
+            SubscribeEvents,
+        )
+        for cls in optional:
+            cls.supported = False
+        BaseRequest.setServerAddress("localhost", it.server.server_port)
+        for cls in optional:
+            it.assertIsNone(cls.supported)
+
+    @it.should("decode the response only once")
+    def test():
+        response = RequestQueuedMessages(project_file="foo.prj").sendRequest()
+        with mock.patch("vimhdl.base_requests.decode", return_value={}) as decode:
+            response.json()
+            response.json()
+        decode.assert_called_once()
+
+    with it.having("JSON as wire format"):
+
+        @it.has_test_setup
+        def setup():
+            BaseRequest.wire_format = JSON
+            BaseRequest._format_checked = False
+            it.server.paths.clear()
+
+        @it.has_test_teardown
+        def teardown():
+            BaseRequest.wire_format = FORM
+            it.server.accepts_json = True
+            it.server.lists_formats = True
+            it.server.inflates_requests = True
+
+        @it.should("send payloads JSON encoded")
+        def test():
+            response = RequestQueuedMessages(project_file="foo.prj").sendRequest()
+            it.assertEqual(response.json()["payload"], {"project_file": "foo.prj"})
+
+        @it.should("check the formats the server supports only once")
+        def test():
+            for _ in range(3):
+                RequestQueuedMessages(project_file="foo.prj").sendRequest()
+            it.assertEqual(
+                it.server.paths, ["/get_diagnose_info"] + ["/get_ui_messages"] * 3
+            )
+
+        @it.should("fall back to form encoding if the server doesn't list JSON")
+        def test():
+            # Like hdl_checker, which finds no fields in JSON payloads instead
+            # of rejecting them
+            it.server.lists_formats = False
+            response = RequestQueuedMessages(project_file="foo.prj").sendRequest()
+            it.assertEqual(response.json()["payload"], "project_file=foo.prj")
+            it.assertEqual(BaseRequest.wire_format, FORM)
+
+        @it.should("compress large payloads")
+        def test():
+            path = "x" * COMPRESS_THRESHOLD
+            response = GetDependencies(project_file="foo.prj", path=path).sendRequest()
+            it.assertEqual(response.json()["payload"]["path"], path)
+            it.assertEqual(it.server.encodings[-1], "deflate")
+
+        @it.should("not compress payloads unless the server inflates them")
+        def test():
+            it.server.inflates_requests = False
+            path = "x" * COMPRESS_THRESHOLD
+            response = GetDependencies(project_file="foo.prj", path=path).sendRequest()
+            it.assertEqual(response.json()["payload"]["path"], path)
+            it.assertIsNone(it.server.encodings[-1])
+            it.assertEqual(BaseRequest.wire_format, JSON)
+
+        @it.should("fall back to form encoding if the server rejects JSON")
+        def test():
+            it.server.accepts_json = False
+            response = RequestQueuedMessages(project_file="foo.prj").sendRequest()
+            it.assertEqual(response.json()["payload"], "project_file=foo.prj")
+            it.assertEqual(BaseRequest.wire_format, FORM)
+
+    with it.having("a batch of requests"):
+
+        @it.has_test_setup
+        def setup():
+            BatchRequest.supported = None
+            del it.server.paths[:]
+
+        @it.has_test_teardown
+        def teardown():
+            it.server.supports_batch = True
+            BatchRequest.supported = None
+
+        @it.should("send all requests in a single exchange")
+        def test():
+            responses = BatchRequest(
+                GetDependencies(project_file="foo.prj", path="bar.vhd"),
+                RequestQueuedMessages(project_file="foo.prj"),
+            ).sendRequest()
+
+            it.assertEqual(it.server.paths, ["/batch"])
+            it.assertEqual(
+                [x.json() for x in responses],
+                [
+                    {
+                        "path": "/get_dependencies",
+                        "payload": {"project_file": "foo.prj", "path": "bar.vhd"},
+                    },
+                    {
+                        "path": "/get_ui_messages",
+                        "payload": {"project_file": "foo.prj"},
+                    },
+                ],
+            )
+
+        @it.should("send requests one by one if the server doesn't support it")
+        def test():
+            it.server.supports_batch = False
+            for _ in range(2):
+                responses = BatchRequest(
+                    GetDependencies(project_file="foo.prj", path="bar.vhd"),
+                    RequestQueuedMessages(project_file="foo.prj"),
+                ).sendRequest()
+
+                it.assertEqual(
+                    [x.json()["path"] for x in responses],
+                    ["/get_dependencies", "/get_ui_messages"],
+                )
+
+            # Batch endpoint should only be tried once
+            it.assertEqual(
+                it.server.paths,
+                ["/batch"] + ["/get_dependencies", "/get_ui_messages"] * 2,
+            )
+
+    with it.having("a request for multiple paths"):
+
+        @it.has_test_setup
+        def setup():
+            RequestMessagesByPaths.supported = None
+            BatchRequest.supported = None
+            del it.server.paths[:]
+
+        @it.has_test_teardown
+        def teardown():
+            it.server.supports_multiple_paths = True
+            RequestMessagesByPaths.supported = None
+            BatchRequest.supported = None
+
+        @it.should("get messages for all paths in a single exchange")
+        def test():
+            responses = RequestMessagesByPaths(
+                project_file="foo.prj", paths=["foo.vhd", "bar.vhd"]
+            ).sendRequest()
+
+            it.assertEqual(it.server.paths, ["/get_messages_by_paths"])
+            it.assertEqual(
+                [x.json() for x in responses],
+                [
+                    {"messages": [{"path": "foo.vhd"}]},
+                    {"messages": [{"path": "bar.vhd"}]},
+                ],
+            )
+
+        @it.should("batch requests for each path if the server doesn't support it")
+        def test():
+            it.server.supports_multiple_paths = False
+            responses = RequestMessagesByPaths(
+                project_file="foo.prj", paths=["foo.vhd", "bar.vhd"]
+            ).sendRequest()
+
+            it.assertEqual(it.server.paths, ["/get_messages_by_paths", "/batch"])
+            it.assertEqual(
+                [x.json()["payload"]["path"] for x in responses],
+                ["foo.vhd", "bar.vhd"],
+            )
+            it.assertIs(RequestMessagesByPaths.supported, False)
+
+    with it.having("a request for unsaved contents"):
+
+        @it.has_test_teardown
+        def teardown():
+            RequestMessagesByContent.supported = None
+            it.server.checks_content = True
+
+        @it.should("send the contents to be checked")
+        def test():
+            response = RequestMessagesByContent(
+                project_file="foo.prj", path="foo.vhd", content="entity foo"
+            ).sendRequest()
+            it.assertEqual(response.json()["path"], "/get_messages_by_content")
+            it.assertIn("content=entity+foo", response.json()["payload"])
+            it.assertTrue(RequestMessagesByContent.supported)
+
+        @it.should("stop sending contents if the server can't check them")
+        def test():
+            it.server.checks_content = False
+            it.server.paths.clear()
+            for _ in range(2):
+                it.assertIsNone(
+                    RequestMessagesByContent(
+                        project_file="foo.prj", path="foo.vhd", content="entity foo"
+                    ).sendRequest()
+                )
+            it.assertIs(RequestMessagesByContent.supported, False)
+            it.assertEqual(it.server.paths, ["/get_messages_by_content"])
+
+    with it.having("an event subscription"):
+
+        @it.has_test_setup
+        def setup():
+            SubscribeEvents.supported = None
+            it.events = []
+            it.opened = []
+
+        @it.has_test_teardown
+        def teardown():
+            it.server.pushes_events = True
+            SubscribeEvents.supported = None
+
+        def listen():
+            return BaseRequest.loop.run(
+                SubscribeEvents(project_file="foo.prj").listen(
+                    it.events.append, on_open=lambda: it.opened.append(True)
+                )
+            ).result(5)
+
+        @it.should("receive events pushed by the server")
+        def test():
+            it.server.events = [
+                {"event": "ui_messages", "ui_messages": [["info", "foo"]]},
+                {"event": "diagnostics_ready", "path": "bar.vhd"},
+            ]
+            it.assertTrue(listen())
+            it.assertEqual(it.opened, [True])
+            it.assertEqual(it.events, it.server.events)
+            it.assertTrue(SubscribeEvents.supported)
+
+        @it.should("report servers that don't push events")
+        def test():
+            it.server.pushes_events = False
+            it.assertIs(listen(), False)
+            it.assertEqual(it.opened, [])
+            it.assertIs(SubscribeEvents.supported, False)
+
+    with it.having("a server listening on a Unix socket"):
+
+        @it.has_setup
+        def setup():
+            it.socket_dir = tempfile.TemporaryDirectory(prefix="vimhdl_test_")
+            it.unix_server = _startServer(
+                socket_path=p.join(it.socket_dir.name, "server.sock")
+            )
+            BaseRequest.setServerAddress(socket_path=it.unix_server.server_address)
+
+        @it.has_teardown
+        def teardown():
+            BaseRequest.setServerAddress("localhost", it.server.server_port)
+            _stopServer(it.unix_server)
+            it.socket_dir.cleanup()
+
+        @it.should("send requests through the socket")
+        def test():
+            response = RequestQueuedMessages(project_file="foo.prj").sendRequest()
+            it.assertEqual(response.json()["path"], "/get_ui_messages")
+            it.assertEqual(response.json()["payload"], "project_file=foo.prj")
+
+        @it.should("reuse the same connection for consecutive requests")
+        def test():
+            for _ in range(10):
+                it.assertIsNotNone(RequestQueuedMessages(project_file="").sendRequest())
+            it.assertEqual(len(it.unix_server.sockets), 1)
+
+
+it.createTests(globals())
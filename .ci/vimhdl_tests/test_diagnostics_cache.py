@@ -0,0 +1,88 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import logging
+import os.path as p
+import sys
+
+from nose2.tools import such
+
+_logger = logging.getLogger(__name__)
+
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), "..", ".."))
+    for path in (p.join(base_path, "python"),):
+        assert p.exists(path), "Path '%s' doesn't exists!" % path
+        sys.path.insert(0, path)
+
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.diagnostics_cache import DiagnosticsCache
+
+# pylint: enable=import-error,wrong-import-position
+
+
+with such.A("diagnostics cache") as it:
+
+    @it.has_test_setup
+    def setup():
+        it.cache = DiagnosticsCache(max_size=2)
+
+    @it.should("return entries stored with the same state")
+    def test():
+        it.cache.put("foo.vhd", (1, 2.0, 3.0), ["foo"])
+        it.assertEqual(it.cache.get("foo.vhd", (1, 2.0, 3.0)), ["foo"])
+
+    @it.should("not return entries stored with a different state")
+    def test():
+        it.cache.put("foo.vhd", (1, 2.0, 3.0), ["foo"])
+        it.assertIsNone(it.cache.get("foo.vhd", (2, 2.0, 3.0)))
+        it.assertIsNone(it.cache.get("foo.vhd", (1, 2.0, 4.0)))
+        it.assertIsNone(it.cache.get("bar.vhd", (1, 2.0, 3.0)))
+
+    @it.should("evict the least recently used path when full")
+    def test():
+        it.cache.put("foo.vhd", 0, ["foo"])
+        it.cache.put("bar.vhd", 0, ["bar"])
+        it.cache.get("foo.vhd", 0)
+        it.cache.put("baz.vhd", 0, ["baz"])
+
+        it.assertIn("foo.vhd", it.cache)
+        it.assertNotIn("bar.vhd", it.cache)
+        it.assertIn("baz.vhd", it.cache)
+
+    @it.should("evict a single path")
+    def test():
+        it.cache.put("foo.vhd", 0, ["foo"])
+        it.cache.put("bar.vhd", 0, ["bar"])
+        it.cache.evict("foo.vhd")
+        it.assertEqual(len(it.cache), 1)
+        it.assertNotIn("foo.vhd", it.cache)
+
+    @it.should("not store anything when size is 0")
+    def test():
+        cache = DiagnosticsCache(max_size=0)
+        cache.put("foo.vhd", 0, ["foo"])
+        it.assertEqual(len(cache), 0)
+
+
+it.createTests(globals())
@@ -0,0 +1,228 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import asyncio
+import logging
+import os.path as p
+import sys
+import threading
+
+from nose2.tools import such
+
+_logger = logging.getLogger(__name__)
+
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), "..", ".."))
+    for path in (p.join(base_path, "python"),):
+        assert p.exists(path), "Path '%s' doesn't exists!" % path
+        sys.path.insert(0, path)
+
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.async_client import EventLoopThread
+from vimhdl.executor import RequestCoalescer, RequestExecutor
+
+# pylint: enable=import-error,wrong-import-position
+
+
+_LOOP = EventLoopThread()
+
+
+class _Request(object):  # pylint: disable=useless-object-inheritance
+    """
+    Request whose send coroutine only returns once release is set
+    """
+
+    running = 0
+    max_running = 0
+
+    def __init__(self, name, idempotent=True, release=None):
+        self.name = name
+        self.idempotent = idempotent
+        self.release = release or threading.Event()
+        self.started = threading.Event()
+
+    async def send(self):
+        _Request.running += 1
+        _Request.max_running = max(_Request.max_running, _Request.running)
+        self.started.set()
+        try:
+            for _ in range(500):
+                if self.release.is_set():
+                    break
+                await asyncio.sleep(0.01)
+            return self.name
+        finally:
+            _Request.running -= 1
+
+
+with such.A("request executor") as it:
+
+    @it.has_test_setup
+    def setup():
+        it.executor = RequestExecutor(_LOOP, workers=1, max_pending=2)
+        _Request.max_running = 0
+        it.release = threading.Event()
+        it.results = []
+
+    @it.has_test_teardown
+    def teardown():
+        it.release.set()
+        it.executor.shutdown()
+
+    def busyExecutor():
+        "Submits a request that keeps the only worker busy"
+        busy = _Request("busy", release=it.release)
+        it.executor.submit(busy, it.results.append)
+        it.assertTrue(busy.started.wait(5))
+
+    @it.should("not send more requests at once than workers")
+    def test():
+        busyExecutor()
+        for i in range(10):
+            it.executor.submit(_Request(i, release=it.release))
+        it.assertEqual(it.executor.workers, 1)
+        it.assertEqual(len(it.executor), 2)
+
+        done = threading.Event()
+        it.executor.submit(
+            _Request("last", idempotent=False, release=it.release),
+            lambda x: done.set(),
+        )
+        it.release.set()
+        it.assertTrue(done.wait(5))
+        it.assertEqual(_Request.max_running, 1)
+
+    @it.should("drop the oldest idempotent request when the queue is full")
+    def test():
+        busyExecutor()
+        for i in range(4):
+            it.assertTrue(
+                it.executor.submit(_Request(i, release=it.release), it.results.append)
+            )
+
+        it.assertEqual([x[0].name for x in it.executor._pending], [2, 3])
+
+    @it.should("drop new idempotent requests if no other can be dropped")
+    def test():
+        busyExecutor()
+        for i in range(2):
+            it.executor.submit(_Request(i, idempotent=False, release=it.release))
+
+        it.assertFalse(it.executor.submit(_Request(2, release=it.release)))
+        it.assertEqual([x[0].name for x in it.executor._pending], [0, 1])
+
+    @it.should("block non idempotent requests until there's room for them")
+    def test():
+        busyExecutor()
+        for i in range(2):
+            it.executor.submit(_Request(i, idempotent=False, release=it.release))
+
+        submitted = threading.Event()
+
+        def submit():
+            it.executor.submit(
+                _Request(2, idempotent=False, release=it.release), it.results.append
+            )
+            submitted.set()
+
+        threading.Thread(target=submit).start()
+        it.assertFalse(submitted.wait(0.2))
+
+        it.release.set()
+        it.assertTrue(submitted.wait(5))
+
+    @it.should("call the callback with the request result")
+    def test():
+        it.release.set()
+        done = threading.Event()
+        it.executor.submit(_Request("foo", release=it.release), lambda x: done.set())
+        it.assertTrue(done.wait(5))
+
+    @it.should("call the callback with None when dropping a request")
+    def test():
+        busyExecutor()
+        for i in range(3):
+            it.executor.submit(_Request(i, release=it.release), it.results.append)
+        it.assertEqual(it.results, [None])
+
+    @it.should("cancel queued requests matching a predicate")
+    def test():
+        busyExecutor()
+        for i in range(2):
+            it.executor.submit(_Request(i, release=it.release), it.results.append)
+
+        it.assertEqual(it.executor.cancel(lambda x: x.name == 0), 1)
+        it.assertEqual([x[0].name for x in it.executor._pending], [1])
+        it.assertEqual(it.results, [None])
+
+    with it.having("a coalescer"):
+
+        @it.has_test_setup
+        def setup():
+            it.coalescer = RequestCoalescer(it.executor)
+
+        @it.should("keep a single request in flight per key")
+        def test():
+            first = _Request("first", release=it.release)
+            it.assertTrue(it.coalescer.submit("foo", first, it.results.append))
+            it.assertTrue(first.started.wait(5))
+
+            for i in range(10):
+                it.assertFalse(
+                    it.coalescer.submit(
+                        "foo", _Request(i, release=it.release), it.results.append
+                    )
+                )
+
+            it.assertEqual(len(it.executor), 0)
+
+        @it.should("send the latest follow-up once the request in flight is done")
+        def test():
+            done = threading.Event()
+            first = _Request("first", release=it.release)
+            it.coalescer.submit("foo", first, it.results.append)
+            it.assertTrue(first.started.wait(5))
+
+            for i in range(3):
+                it.coalescer.submit(
+                    "foo", _Request(i, release=it.release), it.results.append
+                )
+            it.coalescer.submit(
+                "foo", _Request("last", release=it.release), lambda x: done.set()
+            )
+
+            it.release.set()
+            it.assertTrue(done.wait(5))
+            it.assertEqual(it.results, ["first"])
+
+        @it.should("not coalesce requests with different keys")
+        def test():
+            it.assertTrue(
+                it.coalescer.submit("foo", _Request("foo", release=it.release))
+            )
+            it.assertTrue(
+                it.coalescer.submit("bar", _Request("bar", release=it.release))
+            )
+
+
+it.createTests(globals())
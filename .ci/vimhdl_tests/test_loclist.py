@@ -0,0 +1,105 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import logging
+import os.path as p
+import sys
+
+from nose2.tools import such
+
+_logger = logging.getLogger(__name__)
+
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), "..", ".."))
+    for path in (p.join(base_path, "python"),):
+        assert p.exists(path), "Path '%s' doesn't exists!" % path
+        sys.path.insert(0, path)
+
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.loclist import LoclistEntry, sortEntries
+
+# pylint: enable=import-error,wrong-import-position
+
+
+def _message(**kwargs):
+    msg = {
+        "line_number": 0,
+        "column_number": 0,
+        "text": "foo",
+        "severity": "W",
+        "error_code": None,
+        "filename": None,
+    }
+    msg.update(kwargs)
+    return msg
+
+
+with such.A("location list entry") as it:
+
+    @it.should("convert messages to setloclist() dicts")
+    def test():
+        entry = LoclistEntry.fromMessage(
+            _message(line_number=2, column_number=4, error_subtype="Style"),
+            "1",
+            "foo.vhd",
+        )
+        it.assertEqual(
+            entry.toDict(),
+            {
+                "lnum": 3,
+                "bufnr": "1",
+                "filename": "foo.vhd",
+                "valid": "1",
+                "text": "foo",
+                "nr": 0,
+                "type": "W",
+                "col": 5,
+                "subtype": "Style",
+            },
+        )
+
+    @it.should("keep error codes that are not numbers")
+    def test():
+        entry = LoclistEntry.fromMessage(_message(error_code="E1"), "1", "foo.vhd")
+        it.assertEqual(entry.nr, "E1")
+        it.assertNotIn("subtype", entry.toDict())
+
+    @it.should("sort by severity, line, column and error number")
+    def test():
+        entries = [
+            LoclistEntry.fromMessage(_message(**kwargs), "1", "foo.vhd")
+            for kwargs in (
+                {"line_number": 3},
+                {"line_number": 1, "column_number": 2},
+                {"line_number": 1, "error_code": "12"},
+                {"line_number": 1, "error_code": "E1"},
+                {"line_number": 5, "severity": "Error"},
+            )
+        ]
+        it.assertEqual(
+            [(x.lnum, x.col, x.nr) for x in sortEntries(entries)],
+            [(6, 1, 0), (2, 1, "E1"), (2, 1, 12), (2, 3, 0), (4, 1, 0)],
+        )
+
+
+it.createTests(globals())
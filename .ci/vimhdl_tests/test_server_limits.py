@@ -0,0 +1,107 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import logging
+import os
+import os.path as p
+import shutil
+import subprocess as subp
+import sys
+import time
+
+from nose2.tools import such
+
+_logger = logging.getLogger(__name__)
+
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), "..", ".."))
+    for path in (p.join(base_path, "python"),):
+        assert p.exists(path), "Path '%s' doesn't exists!" % path
+        sys.path.insert(0, path)
+
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.server_limits import ServerLimits
+
+# pylint: enable=import-error,wrong-import-position
+
+
+with such.A("server limits") as it:
+
+    @it.has_test_teardown
+    def teardown():
+        if getattr(it, "proc", None) is not None:
+            it.proc.kill()
+            it.proc.wait()
+            it.proc = None
+
+    def start(limits, expected):
+        it.proc = subp.Popen(limits.wrapCommand(["sleep", "30"]))
+        # Limits are set by the commands wrapping sleep right before they
+        # execute the next one
+        for _ in range(50):
+            info = limits.describe(it.proc.pid)
+            if set(expected) <= set(info):
+                break
+            time.sleep(0.05)
+        return info
+
+    @it.should("leave the defaults unless set")
+    def test():
+        limits = ServerLimits()
+        it.assertEqual(limits.wrapCommand(["foo"]), ["foo"])
+        expected = [
+            "Server nice value: %d" % os.getpriority(os.PRIO_PROCESS, 0),
+            "Server memory limit: unlimited",
+        ]
+        info = start(limits, expected)
+        for line in expected:
+            it.assertIn(line, info)
+
+    @it.should("start the process with the limits set")
+    def test():
+        if shutil.which("nice") is None or shutil.which("prlimit") is None:
+            raise it.skipTest("nice or prlimit is not available")
+        limits = ServerLimits(nice=5, memory_limit=512)
+        it.assertEqual(limits.wrapCommand(["foo", "--bar"])[-2:], ["foo", "--bar"])
+        expected = [
+            "Server nice value: %d" % (os.getpriority(os.PRIO_PROCESS, 0) + 5),
+            "Server memory limit: 512 MiB",
+        ]
+        info = start(limits, expected)
+        for line in expected:
+            it.assertIn(line, info)
+
+    @it.should("set the I/O class via ionice")
+    def test():
+        if shutil.which("ionice") is None:
+            raise it.skipTest("ionice is not available")
+        limits = ServerLimits(io_class="idle")
+        info = start(limits, ["Server I/O class: idle"])
+        it.assertIn("Server I/O class: idle", info)
+
+    @it.should("ignore invalid I/O classes")
+    def test():
+        it.assertIsNone(ServerLimits(io_class="realtime").io_class)
+
+
+it.createTests(globals())
@@ -0,0 +1,131 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import logging
+import os
+import os.path as p
+import shutil
+import sys
+import tempfile
+import threading
+
+from nose2.tools import such
+
+_logger = logging.getLogger(__name__)
+
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), "..", ".."))
+    for path in (p.join(base_path, "python"),):
+        assert p.exists(path), "Path '%s' doesn't exists!" % path
+        sys.path.insert(0, path)
+
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.server_monitor import ResourceSample, ServerMonitor, sampleProcess
+
+# pylint: enable=import-error,wrong-import-position
+
+_MIB = 1024 * 1024
+
+
+def _sample(timestamp=0, rss=0, cpu_time=0, pid=1):
+    return ResourceSample(timestamp, pid, rss * _MIB, cpu_time, 3)
+
+
+with such.A("server monitor") as it:
+
+    @it.has_test_setup
+    def setup():
+        it.monitor = ServerMonitor(interval=0.01, max_rss=100 * _MIB, history=3)
+
+    @it.has_test_teardown
+    def teardown():
+        it.monitor.stop()
+
+    @it.should("read a process' resources from /proc")
+    def test():
+        if not p.exists("/proc/self/stat"):
+            raise it.skipTest("/proc is not available")
+        sample = sampleProcess(os.getpid())
+        it.assertEqual(sample.pid, os.getpid())
+        it.assertGreater(sample.rss, 0)
+        it.assertGreater(sample.cpu_time, 0)
+        it.assertGreater(sample.open_files, 0)
+
+    @it.should("parse command names with spaces and parenthesis")
+    def test():
+        proc_dir = tempfile.mkdtemp()
+        try:
+            os.makedirs(p.join(proc_dir, "123", "fd"))
+            for name in ("0", "1", "2"):
+                open(p.join(proc_dir, "123", "fd", name), "w").close()
+            fields = ["S"] + ["0"] * 10 + ["200", "100"] + ["0"] * 8 + ["256"]
+            with open(p.join(proc_dir, "123", "stat"), "w") as fd:
+                fd.write("123 (foo (bar) baz) " + " ".join(fields))
+            sample = sampleProcess(123, proc_dir)
+        finally:
+            shutil.rmtree(proc_dir)
+
+        it.assertEqual(sample.cpu_time, 300 / os.sysconf("SC_CLK_TCK"))
+        it.assertEqual(sample.rss, 256 * os.sysconf("SC_PAGE_SIZE"))
+        it.assertEqual(sample.open_files, 3)
+
+    @it.should("not sample processes that don't exist")
+    def test():
+        it.assertIsNone(sampleProcess(0, tempfile.gettempdir()))
+
+    @it.should("report memory usage over the limit for consecutive samples")
+    def test():
+        it.assertFalse(it.monitor.add(_sample(rss=200)))
+        it.assertFalse(it.monitor.add(_sample(rss=50)))
+        it.assertFalse(it.monitor.add(_sample(rss=200)))
+        it.assertTrue(it.monitor.add(_sample(rss=200)))
+        it.assertFalse(it.monitor.add(_sample(rss=200)))
+
+    @it.should("not report memory usage without a limit")
+    def test():
+        it.monitor.max_rss = 0
+        for _ in range(5):
+            it.assertFalse(it.monitor.add(_sample(rss=200)))
+
+    @it.should("keep the last samples and show CPU usage between them")
+    def test():
+        for i in range(4):
+            it.monitor.add(_sample(timestamp=10 * i, rss=i, cpu_time=i))
+        it.monitor.add(_sample(timestamp=40, rss=4, cpu_time=0, pid=2))
+
+        lines = it.monitor.describe()
+        it.assertEqual(len(lines), 3)
+        it.assertIn("pid 1: RSS 2 MiB, CPU -, 3 open files", lines[0])
+        it.assertIn("pid 1: RSS 3 MiB, CPU 10.0%, 3 open files", lines[1])
+        it.assertIn("pid 2: RSS 4 MiB, CPU -, 3 open files", lines[2])
+
+    @it.should("sample the process periodically")
+    def test():
+        reported = threading.Event()
+        it.monitor.max_rss = 1
+        it.monitor.start(os.getpid, lambda sample: reported.set())
+        it.assertTrue(reported.wait(5))
+        it.assertTrue(it.monitor.getSamples())
+
+
+it.createTests(globals())
@@ -0,0 +1,93 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import logging
+import os.path as p
+import subprocess as subp
+import sys
+
+from nose2.tools import such
+
+_logger = logging.getLogger(__name__)
+
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), "..", ".."))
+    for path in (p.join(base_path, "python"),):
+        assert p.exists(path), "Path '%s' doesn't exists!" % path
+        sys.path.insert(0, path)
+
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.server_output import OutputBuffer
+
+# pylint: enable=import-error,wrong-import-position
+
+
+with such.A("server output buffer") as it:
+
+    @it.has_test_setup
+    def setup():
+        it.output = OutputBuffer(max_size=10)
+
+    @it.should("keep lines along with the stream they were written to")
+    def test():
+        it.output.append("stdout", "foo")
+        it.output.append("stderr", "bar")
+        it.assertEqual(it.output.getLines(), ["[stdout] foo", "[stderr] bar"])
+        it.assertEqual(it.output.getLines(1), ["[stderr] bar"])
+        it.assertEqual(it.output.getLines(0), [])
+
+    @it.should("drop the oldest lines once full")
+    def test():
+        for line in ("aaaa", "bbbb", "cccc"):
+            it.output.append("stdout", line)
+        it.assertEqual(it.output.getLines(), ["[stdout] bbbb", "[stdout] cccc"])
+
+    @it.should("drain pipes so that processes don't block writing to them")
+    def test():
+        output = OutputBuffer(max_size=1024)
+        # Writes way more than a pipe can hold to both stdout and stderr
+        script = "\n".join(
+            [
+                "import sys",
+                "for i in range(20000):",
+                "    print('out %d' % i)",
+                "    print('err %d' % i, file=sys.stderr)",
+            ]
+        )
+        proc = subp.Popen(
+            [sys.executable, "-c", script], stdout=subp.PIPE, stderr=subp.PIPE
+        )
+        threads = [
+            output.drain("stdout", proc.stdout),
+            output.drain("stderr", proc.stderr),
+        ]
+        it.assertEqual(proc.wait(30), 0)
+        for thread in threads:
+            thread.join(5)
+
+        lines = output.getLines()
+        it.assertIn(lines[-1], ("[stdout] out 19999", "[stderr] err 19999"))
+        it.assertLessEqual(sum(len(x) for x in lines), 2048)
+
+
+it.createTests(globals())
@@ -0,0 +1,154 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import logging
+import os
+import os.path as p
+import shutil
+import subprocess as subp
+import sys
+import tempfile
+
+from nose2.tools import such
+
+try:  # Python 3.x
+    import unittest.mock as mock # pylint: disable=import-error, no-name-in-module
+except ImportError:  # Python 2.x
+    import mock
+
+_logger = logging.getLogger(__name__)
+
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), "..", ".."))
+    for path in (p.join(base_path, "python"),):
+        assert p.exists(path), "Path '%s' doesn't exists!" % path
+        sys.path.insert(0, path)
+
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.shared_server import ProcessHandle, SharedServer, getProcessStartTime
+
+# pylint: enable=import-error,wrong-import-position
+
+
+def _deadPid():
+    "Returns the PID of a process that has already exited"
+    proc = subp.Popen(["true"])
+    proc.wait()
+    return proc.pid
+
+
+with such.A("shared server") as it:
+
+    @it.has_test_setup
+    def setup():
+        it.tmp_dir = tempfile.mkdtemp()
+        it.shared = SharedServer(it.tmp_dir, "/foo/vimhdl.prj")
+        it.server = subp.Popen(["sleep", "30"])
+
+    @it.has_test_teardown
+    def teardown():
+        it.server.kill()
+        it.server.wait()
+        shutil.rmtree(it.tmp_dir)
+
+    @it.should("not find a server until one is registered")
+    def test():
+        with it.shared.lock():
+            it.assertIsNone(it.shared.attach(1))
+            it.shared.register(os.getpid(), pid=it.server.pid, port=1234)
+            info = it.shared.attach(os.getppid())
+
+        it.assertEqual(info["port"], 1234)
+        it.assertEqual(info["clients"], sorted([os.getpid(), os.getppid()]))
+
+    @it.should("use a different discovery file per project")
+    def test():
+        it.assertNotEqual(
+            it.shared.filename,
+            SharedServer(it.tmp_dir, "/bar/vimhdl.prj").filename,
+        )
+
+    @it.should("ask the last client to leave to stop the server")
+    def test():
+        with it.shared.lock():
+            it.shared.register(os.getpid(), pid=it.server.pid)
+            it.shared.attach(os.getppid())
+            it.assertFalse(it.shared.detach(os.getpid()))
+            it.assertTrue(it.shared.detach(os.getppid()))
+        it.assertFalse(p.exists(it.shared.filename))
+
+    @it.should("forget clients that have exited")
+    def test():
+        with it.shared.lock():
+            it.shared.register(_deadPid(), pid=it.server.pid)
+            it.assertEqual(it.shared.attach(os.getpid())["clients"], [os.getpid()])
+            it.assertTrue(it.shared.detach(os.getpid()))
+
+    @it.should("not attach to servers that have exited")
+    def test():
+        with it.shared.lock():
+            it.shared.register(os.getpid(), pid=_deadPid())
+            it.assertIsNone(it.shared.attach(os.getppid()))
+        it.assertFalse(p.exists(it.shared.filename))
+
+    @it.should("attach to servers started when they were registered")
+    def test():
+        start_time = getProcessStartTime(it.server.pid)
+        it.assertIsNotNone(start_time)
+        with it.shared.lock():
+            it.shared.register(os.getpid(), pid=it.server.pid, start_time=start_time)
+            it.assertIsNotNone(it.shared.attach(os.getppid()))
+
+    @it.should("not attach to processes that reused the server's PID")
+    def test():
+        with it.shared.lock():
+            it.shared.register(os.getpid(), pid=it.server.pid, start_time="0")
+            it.assertIsNone(it.shared.attach(os.getppid()))
+        it.assertFalse(p.exists(it.shared.filename))
+
+    @it.should("poll and terminate servers started elsewhere")
+    def test():
+        handle = ProcessHandle(it.server.pid, getProcessStartTime(it.server.pid))
+        it.assertIsNone(handle.poll())
+        handle.terminate()
+        it.server.wait()
+        it.assertEqual(handle.poll(), 0)
+
+    @it.should("only check the start time before signalling")
+    def test():
+        handle = ProcessHandle(it.server.pid, getProcessStartTime(it.server.pid))
+        with mock.patch("vimhdl.shared_server.getProcessStartTime") as start_time:
+            it.assertIsNone(handle.poll())
+            with it.assertRaises(subp.TimeoutExpired):
+                handle.wait(0.1)
+            it.assertFalse(start_time.called)
+
+    @it.should("not signal processes that reused the server's PID")
+    def test():
+        handle = ProcessHandle(it.server.pid, "0")
+        handle.kill()
+        it.assertIsNone(it.server.poll())
+        it.assertEqual(handle.poll(), 0)
+
+
+it.createTests(globals())
@@ -0,0 +1,124 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import logging
+import os
+import os.path as p
+import shutil
+import subprocess as subp
+import sys
+import tempfile
+
+from nose2.tools import such
+
+_logger = logging.getLogger(__name__)
+
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), "..", ".."))
+    for path in (p.join(base_path, "python"),):
+        assert p.exists(path), "Path '%s' doesn't exists!" % path
+        sys.path.insert(0, path)
+
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.version_cache import VersionCache, resolveExecutable
+
+# pylint: enable=import-error,wrong-import-position
+
+
+def _writeExecutable(path, version, returncode=0):
+    with open(path, "w") as fd:
+        fd.write("#!/bin/sh\necho {}\nexit {}\n".format(version, returncode))
+    os.chmod(path, 0o755)
+
+
+with such.A("version cache") as it:
+
+    @it.has_test_setup
+    def setup():
+        it.tmp_dir = tempfile.mkdtemp()
+        it.executable = p.join(it.tmp_dir, "hdl_checker")
+        _writeExecutable(it.executable, "1.0")
+        it.cache = VersionCache(p.join(it.tmp_dir, "cache", "versions.json"))
+        it.environ = dict(os.environ)
+
+    @it.has_test_teardown
+    def teardown():
+        os.environ.clear()
+        os.environ.update(it.environ)
+        shutil.rmtree(it.tmp_dir)
+
+    @it.should("probe and store the version")
+    def test():
+        it.assertIsNone(it.cache.get(it.executable))
+        it.assertEqual(it.cache.probe(it.executable), "1.0")
+        it.assertEqual(it.cache.get(it.executable), "1.0")
+
+    @it.should("probe in the background")
+    def test():
+        future = it.cache.probeInBackground(it.executable)
+        it.assertEqual(future.result(5), "1.0")
+        it.assertEqual(it.cache.get(it.executable), "1.0")
+
+    @it.should("keep versions across instances")
+    def test():
+        it.cache.put(it.executable, "1.0")
+        it.assertEqual(VersionCache(it.cache.filename).get(it.executable), "1.0")
+
+    @it.should("not return the version if the executable has changed")
+    def test():
+        it.cache.put(it.executable, "1.0")
+        mtime = p.getmtime(it.executable)
+        os.utime(it.executable, (mtime + 10, mtime + 10))
+        it.assertIsNone(it.cache.get(it.executable))
+
+    @it.should("not return the version if the virtual environment has changed")
+    def test():
+        os.environ["VIRTUAL_ENV"] = p.join(it.tmp_dir, "foo")
+        it.cache.put(it.executable, "1.0")
+        os.environ["VIRTUAL_ENV"] = p.join(it.tmp_dir, "bar")
+        it.assertIsNone(it.cache.get(it.executable))
+
+    @it.should("not store the version if the probe fails")
+    def test():
+        _writeExecutable(it.executable, "oops", returncode=1)
+        with it.assertRaises(subp.CalledProcessError):
+            it.cache.probeInBackground(it.executable).result(5)
+        it.assertIsNone(it.cache.get(it.executable))
+
+    @it.should("ignore unreadable cache files")
+    def test():
+        os.makedirs(p.dirname(it.cache.filename))
+        with open(it.cache.filename, "w") as fd:
+            fd.write("not json")
+        it.assertIsNone(it.cache.get(it.executable))
+        it.cache.put(it.executable, "1.0")
+        it.assertEqual(it.cache.get(it.executable), "1.0")
+
+    @it.should("resolve executables on PATH")
+    def test():
+        os.environ["PATH"] = it.tmp_dir + os.pathsep + os.environ["PATH"]
+        it.assertEqual(resolveExecutable("hdl_checker"), p.realpath(it.executable))
+        it.assertIsNone(resolveExecutable("surely_not_an_executable"))
+
+
+it.createTests(globals())
@@ -0,0 +1,620 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import logging
+import os
+import os.path as p
+import signal
+import subprocess as subp
+import sys
+import tempfile
+import threading
+import time
+
+from nose2.tools import such
+
+try:  # Python 3.x
+    import unittest.mock as mock # pylint: disable=import-error, no-name-in-module
+except ImportError:  # Python 2.x
+    import mock
+
+_logger = logging.getLogger(__name__)
+
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), "..", ".."))
+    for path in (p.join(base_path, "python"),):
+        assert p.exists(path), "Path '%s' doesn't exists!" % path
+        sys.path.insert(0, path)
+
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+import vim
+import vimhdl.vim_helpers as vim_helpers
+from vimhdl.base_requests import (
+    BatchRequest,
+    RequestMessagesByContent,
+    RequestMessagesByPath,
+    RequestQueuedMessages,
+    Response,
+)
+from vimhdl.loclist import LoclistEntry
+from vimhdl.server_monitor import ResourceSample
+from vimhdl.shared_server import ProcessHandle
+from vimhdl.vim_client import VimhdlClient
+from vimhdl.wakeup import WakeUpServer
+
+# pylint: enable=import-error,wrong-import-position
+
+
+def _message(line, text="foo"):
+    return {
+        "line_number": line,
+        "column_number": 0,
+        "text": text,
+        "severity": "W",
+        "error_code": None,
+        "filename": "foo.vhd",
+    }
+
+
+with such.A("vimhdl client") as it:
+
+    @it.has_test_setup
+    def setup():
+        it.client = VimhdlClient(transport="tcp", port=0)
+        it.buffer = mock.MagicMock(number=1)
+        it.buffer.name = "foo.vhd"
+
+    @it.has_test_teardown
+    def teardown():
+        it.client._executor.shutdown()
+
+    def update(content):
+        result = it.client._updateMessages(it.buffer, "foo.vhd", content)
+        return None if result is None else [(x.lnum, x.text) for x in result]
+
+    @it.should("use TCP unless Unix sockets are requested")
+    def test():
+        client = VimhdlClient()
+        client._executor.shutdown()
+        it.assertEqual(client._transport, "tcp")
+        it.assertIsNone(client._socket_path)
+
+    with it.having("messages sent as deltas"):
+
+        @it.should("store all messages along with their version")
+        def test():
+            it.assertEqual(
+                update({"version": 1, "messages": [_message(3), _message(1)]}),
+                [(2, "foo"), (4, "foo")],
+            )
+            it.assertEqual(it.client._stored["foo.vhd"][0], 1)
+
+        @it.should("apply added and removed messages to the stored ones")
+        def test():
+            update({"version": 1, "messages": [_message(1), _message(2), _message(2)]})
+            it.assertEqual(
+                update(
+                    {
+                        "version": 2,
+                        "since": 1,
+                        "added": [_message(5, "bar")],
+                        "removed": [_message(1), _message(2)],
+                    }
+                ),
+                [(3, "foo"), (6, "bar")],
+            )
+            it.assertEqual(it.client._stored["foo.vhd"][0], 2)
+
+        @it.should("not apply deltas to a different version")
+        def test():
+            update({"version": 1, "messages": [_message(1)]})
+            it.assertIsNone(
+                update({"version": 3, "since": 2, "added": [], "removed": []})
+            )
+
+        @it.should("not store messages without a version")
+        def test():
+            update({"version": 1, "messages": [_message(1)]})
+            it.assertEqual(update({"messages": [_message(1)]}), [(2, "foo")])
+            it.assertNotIn("foo.vhd", it.client._stored)
+
+    with it.having("a server without batches"):
+
+        @it.has_test_setup
+        def setup():
+            BatchRequest.supported = False
+
+        @it.has_test_teardown
+        def teardown():
+            BatchRequest.supported = None
+
+        @it.should("only wait for the main request")
+        def test():
+            request = mock.MagicMock()
+            request.sendRequest.return_value = Response(content={})
+            with mock.patch.object(
+                it.client._ui_requests, "submit"
+            ) as submit, mock.patch.object(BatchRequest, "send") as send:
+                response = it.client._sendWithUiMessages(request, "foo.prj")
+
+            it.assertIs(response, request.sendRequest.return_value)
+            send.assert_not_called()
+            submit.assert_called_once()
+            it.assertEqual(submit.call_args[0][0], "foo.prj")
+            it.assertIsInstance(submit.call_args[0][1], RequestQueuedMessages)
+
+    with it.having("check as you type"):
+
+        @it.has_test_setup
+        def setup():
+            it.buffer.__getitem__.return_value = ["library ieee;", "entity foo"]
+
+        @it.should("send the contents of modified buffers")
+        def test():
+            it.client._check_as_you_type = True
+            with mock.patch("vim.eval", return_value="1"):
+                it.assertEqual(
+                    it.client._getUnsavedContent(it.buffer),
+                    "library ieee;\nentity foo",
+                )
+
+        @it.should("not send the contents of unmodified buffers")
+        def test():
+            it.client._check_as_you_type = True
+            with mock.patch("vim.eval", return_value="0"):
+                it.assertIsNone(it.client._getUnsavedContent(it.buffer))
+
+        @it.should("not send contents unless enabled")
+        def test():
+            with mock.patch("vim.eval", return_value="1"):
+                it.assertIsNone(it.client._getUnsavedContent(it.buffer))
+
+        @it.should("not send contents if the server can't check them")
+        def test():
+            it.client._check_as_you_type = True
+            RequestMessagesByContent.supported = False
+            try:
+                with mock.patch("vim.eval", return_value="1"):
+                    it.assertIsNone(it.client._getUnsavedContent(it.buffer))
+            finally:
+                RequestMessagesByContent.supported = None
+
+        @it.should("request the saved file if the server can't check contents")
+        def test():
+            it.client._server_up = True
+            requests = []
+
+            def send(request, _):
+                requests.append(request)
+                if isinstance(request, RequestMessagesByContent):
+                    RequestMessagesByContent.supported = False
+                    return None
+                return Response(content={"messages": [_message(1)]})
+
+            try:
+                with mock.patch.object(
+                    it.client, "_sendWithUiMessages", side_effect=send
+                ), mock.patch.object(it.client, "_isStale", return_value=False):
+                    entries = it.client._requestMessages(
+                        it.buffer, "foo.prj", "foo.vhd", (1, 2.0), content="foo"
+                    )
+            finally:
+                RequestMessagesByContent.supported = None
+
+            it.assertEqual(
+                [type(x) for x in requests],
+                [RequestMessagesByContent, RequestMessagesByPath],
+            )
+            it.assertEqual([(x.lnum, x.text) for x in entries], [(2, "foo")])
+
+    with it.having("prefetched messages"):
+
+        @it.should("skip buffers that don't exist anymore")
+        def test():
+            it.client._server = mock.MagicMock()
+            it.client._server.poll.return_value = None
+            it.client._server_up = True
+            with mock.patch("vim.buffers", {1: it.buffer}), mock.patch(
+                "vim.eval", return_value="0"
+            ), mock.patch.object(it.client._executor, "submit") as submit:
+                it.client.prefetchMessages(["1", "2"])
+
+            submit.assert_called_once()
+            it.assertEqual(submit.call_args[0][0].paths, [p.abspath("foo.vhd")])
+
+        @it.should("cache messages for the generation requested")
+        def test():
+            it.client._generations["foo.vhd"] = (1, 2.0)
+            it.client._handlePrefetch(
+                [("foo.vhd", (1, 2.0), (1, 2.0, 3.0), "1", "foo.vhd")],
+                [Response(content={"messages": [_message(1)]})],
+            )
+            entries = it.client._cache.get("foo.vhd", (1, 2.0, 3.0))
+            it.assertEqual([(x.lnum, x.text) for x in entries], [(2, "foo")])
+
+        @it.should("drop messages for outdated generations")
+        def test():
+            it.client._generations["foo.vhd"] = (2, 2.0)
+            it.client._handlePrefetch(
+                [("foo.vhd", (1, 2.0), (1, 2.0, 3.0), "1", "foo.vhd")],
+                [Response(content={"messages": [_message(1)]})],
+            )
+            it.assertNotIn("foo.vhd", it.client._cache)
+
+    with it.having("the native renderer"):
+
+        @it.has_test_setup
+        def setup():
+            it.client._server = mock.MagicMock()
+            it.client._server.poll.return_value = None
+            it.buffer.name = p.abspath("foo.vhd")
+            vim.command.reset_mock()
+
+        @it.has_test_teardown
+        def teardown():
+            vim_helpers._HAS_JSON_DECODE = None
+
+        @it.should("render cached diagnostics right away")
+        def test():
+            with mock.patch("vim.current.buffer", it.buffer), mock.patch(
+                "vim.eval", return_value="3"
+            ), mock.patch.object(it.client, "_checkInBackground") as check:
+                _, state = it.client._getCacheState(
+                    it.buffer, vim_helpers.getProjectFile()
+                )
+                it.client._cache.put(
+                    it.buffer.name,
+                    state,
+                    [LoclistEntry.fromMessage(_message(1), "1", "foo.vhd")],
+                )
+                it.client.requestDiagnostics()
+
+            check.assert_not_called()
+            vim.command.assert_called_with("call vimhdl#render#apply(1, l:items)")
+
+        @it.should("request diagnostics in the background if not cached")
+        def test():
+            with mock.patch("vim.current.buffer", it.buffer), mock.patch(
+                "vim.eval", return_value="0"
+            ), mock.patch.object(it.client, "_checkInBackground") as check:
+                it.client.requestDiagnostics()
+
+            check.assert_called_once()
+            vim.command.assert_not_called()
+
+    with it.having("a server starting up"):
+
+        @it.has_test_setup
+        def setup():
+            it.client._server = mock.MagicMock()
+            it.client._server.poll.return_value = None
+
+        @it.should("return as soon as the server responds")
+        def test():
+            with mock.patch(
+                "vimhdl.vim_client.RequestHdlCheckerInfo.sendRequest",
+                side_effect=[None, None, Response(content={})],
+            ) as send:
+                start = time.monotonic()
+                it.assertTrue(it.client._waitForServerSetup())
+            it.assertEqual(send.call_count, 3)
+            it.assertLess(time.monotonic() - start, 0.2)
+
+        @it.should("give up if the server exits")
+        def test():
+            it.client._server.poll.return_value = 1
+            it.assertFalse(it.client._waitForServerSetup())
+
+        @it.should("give up once the timeout expires")
+        def test():
+            with mock.patch(
+                "vimhdl.vim_client.RequestHdlCheckerInfo.sendRequest", return_value=None
+            ):
+                start = time.monotonic()
+                it.assertFalse(it.client._waitForServerSetup(timeout=0.3))
+            it.assertLess(time.monotonic() - start, 0.5)
+
+        @it.should("only probe the server once its Unix socket exists")
+        def test():
+            it.client._socket_path = p.join(tempfile.gettempdir(), "vimhdl_none.sock")
+            with mock.patch(
+                "vimhdl.vim_client.RequestHdlCheckerInfo.sendRequest", return_value=None
+            ) as send:
+                it.assertFalse(it.client._waitForServerSetup(timeout=0.1))
+            send.assert_not_called()
+
+    with it.having("requests made before the server is ready"):
+
+        @it.has_test_setup
+        def setup():
+            it.client._server = mock.MagicMock()
+            it.client._server.poll.return_value = None
+            it.client._transport = "tcp"
+            it.calls = []
+
+        @it.should("defer calls until the server responds")
+        def test():
+            it.client._whenReady(it.calls.append, 1)
+            it.client._whenReady(it.calls.append, 2)
+            it.assertEqual(it.calls, [])
+            it.assertFalse(it.client.isServerReady())
+
+            with mock.patch.object(
+                it.client, "_waitForServerSetup", return_value=True
+            ):
+                it.client._finishServerSetup()
+
+            it.assertTrue(it.client.isServerReady())
+            it.assertEqual(it.calls, [1, 2])
+            it.client._whenReady(it.calls.append, 3)
+            it.assertEqual(it.calls, [1, 2, 3])
+
+        @it.should("only keep the last deferred call with the same key")
+        def test():
+            for value in range(300):
+                it.client._whenReady(it.calls.append, value, key="foo")
+            it.client._whenReady(it.calls.append, "bar")
+            it.client._whenReady(it.calls.append, 300, key="foo")
+            with mock.patch.object(
+                it.client, "_waitForServerSetup", return_value=True
+            ):
+                it.client._finishServerSetup()
+
+            it.assertEqual(it.calls, ["bar", 300])
+
+        @it.should("drop deferred calls if the server fails to start")
+        def test():
+            it.client._whenReady(it.calls.append, 1)
+            with mock.patch.object(
+                it.client, "_waitForServerSetup", return_value=False
+            ):
+                it.client._finishServerSetup()
+
+            it.client._whenReady(it.calls.append, 2)
+            it.assertEqual(it.calls, [])
+            it.assertEqual(
+                it.client._ui_queue.get_nowait(),
+                [("error", "Unable to talk to server")],
+            )
+
+        @it.should("answer with no messages and check in the background")
+        def test():
+            it.buffer.name = p.abspath("foo.vhd")
+            with mock.patch("vim.current.buffer", it.buffer), mock.patch(
+                "vim.eval", return_value="0"
+            ), mock.patch.object(it.client, "_checkInBackground") as check:
+                it.assertEqual(it.client.getMessages(), [])
+
+            check.assert_called_once()
+
+    with it.having("events to wait for"):
+
+        @it.has_test_setup
+        def setup():
+            it.client._server = mock.MagicMock()
+            it.client._server.poll.return_value = None
+            it.buffer.name = p.abspath("foo.vhd")
+
+        @it.should("wait for the server while it's starting")
+        def test():
+            it.assertTrue(it.client.needsEvents())
+            it.client._server_up = True
+            it.assertFalse(it.client.needsEvents())
+            it.client._server_up = False
+            it.assertFalse(it.client.needsEvents())
+
+        @it.should("wait for background checks to finish")
+        def test():
+            it.client._server_up = True
+            with mock.patch("vim.eval", return_value="0"), mock.patch.object(
+                it.client._executor, "submit"
+            ) as submit:
+                it.client._checkInBackground(
+                    it.buffer, "foo.prj", it.buffer.name, (1, 2.0), (1, 2.0, 3.0)
+                )
+            it.assertTrue(it.client.needsEvents())
+            handle_response = submit.call_args[0][1]
+            handle_response(None)
+            it.assertFalse(it.client.needsEvents())
+
+        @it.should("not poll for events Vim gets woken up for")
+        def test():
+            it.client._server_up = True
+            it.client._subscribed.add("foo.prj")
+            it.assertTrue(it.client.needsEvents())
+            with mock.patch.object(
+                WakeUpServer, "isConnected", new_callable=mock.PropertyMock
+            ) as connected, mock.patch.object(it.client._wakeup, "wake") as wake:
+                connected.return_value = True
+                it.assertFalse(it.client.needsEvents())
+                it.client._handleServerEvent(
+                    {"event": "diagnostics_ready", "path": it.buffer.name}
+                )
+            wake.assert_called_once_with()
+
+        @it.should("not wait for anything once stopped")
+        def test():
+            it.client._stopped.set()
+            it.assertFalse(it.client.needsEvents())
+
+    with it.having("a server being stopped"):
+
+        @it.has_test_setup
+        def setup():
+            it.client._shutdown_timeout = 0.5
+
+        @it.has_test_teardown
+        def teardown():
+            if it.client._server.poll() is None:
+                it.client._server.kill()
+            it.client._server.wait()
+
+        @it.should("let the server exit after a shutdown request")
+        def test():
+            it.client._server = subp.Popen(["sleep", "30"])
+
+            def shutdown():
+                os.kill(it.client._server.pid, signal.SIGINT)
+                return Response(content={})
+
+            with mock.patch(
+                "vimhdl.vim_client.RequestShutdown.sendRequest", side_effect=shutdown
+            ), mock.patch.object(it.client._server, "terminate") as terminate:
+                it.client._killServer()
+
+            terminate.assert_not_called()
+            it.assertEqual(it.client._server.poll(), -signal.SIGINT)
+
+        @it.should("terminate servers that don't support shutdown requests")
+        def test():
+            it.client._server = subp.Popen(["sleep", "30"])
+            with mock.patch(
+                "vimhdl.vim_client.RequestShutdown.sendRequest", return_value=None
+            ):
+                it.client._killServer()
+            it.assertEqual(it.client._server.poll(), -signal.SIGTERM)
+
+        @it.should("kill servers that don't exit")
+        def test():
+            it.client._server = subp.Popen(["sh", "-c", "trap '' TERM; sleep 30"])
+            time.sleep(0.1)
+            with mock.patch(
+                "vimhdl.vim_client.RequestShutdown.sendRequest", return_value=None
+            ):
+                it.client._killServer()
+            it.assertEqual(it.client._server.wait(5), -signal.SIGKILL)
+
+    with it.having("a supervised server"):
+
+        @it.has_test_setup
+        def setup():
+            it.client._server = subp.Popen(["sleep", "0.1"])
+            it.client._server_up = True
+            it.servers = []
+
+            def startServerProcess():
+                it.client._server = subp.Popen(["sleep", "30"])
+                it.servers.append(it.client._server)
+
+            it.patches = [
+                mock.patch.object(
+                    it.client, "_startServerProcess", side_effect=startServerProcess
+                ),
+                mock.patch("vimhdl.vim_client._RESTART_MIN_DELAY", 0.01),
+                mock.patch("vimhdl.vim_client._RESTART_MAX_ATTEMPTS", 2),
+            ]
+            for patch in it.patches:
+                patch.start()
+
+        @it.has_test_teardown
+        def teardown():
+            for patch in it.patches:
+                patch.stop()
+            it.client._stopped.set()
+            for server in it.servers:
+                server.kill()
+                server.wait()
+
+        @it.should("restart the server when it exits")
+        def test():
+            with mock.patch.object(
+                it.client, "_waitForServerSetup", return_value=True
+            ):
+                thread = threading.Thread(target=it.client._superviseServer)
+                thread.start()
+                for _ in range(100):
+                    if it.client._restarted:
+                        break
+                    time.sleep(0.05)
+
+            it.assertTrue(it.client._restarted)
+            it.assertTrue(it.client.isServerReady())
+            it.assertEqual(len(it.servers), 1)
+
+            it.client._stopped.set()
+            it.servers[0].kill()
+            thread.join(5)
+            it.assertFalse(thread.is_alive())
+
+        @it.should("restart servers using too much memory right away")
+        def test():
+            it.client._server = subp.Popen(["sleep", "30"])
+            it.servers.append(it.client._server)
+            sample = ResourceSample(time.time(), 0, 2 * 1024 * 1024, 0, 0)
+            with mock.patch.object(
+                it.client, "_waitForServerSetup", return_value=True
+            ), mock.patch("vimhdl.vim_client._RESTART_MIN_DELAY", 10), mock.patch(
+                "vimhdl.vim_client.RequestShutdown.sendRequest", return_value=None
+            ):
+                thread = threading.Thread(target=it.client._superviseServer)
+                thread.start()
+                it.client._recycleServer(sample)
+                for _ in range(100):
+                    if it.client._restarted:
+                        break
+                    time.sleep(0.05)
+
+            it.assertTrue(it.client._restarted)
+            it.assertEqual(len(it.servers), 2)
+            it.assertEqual(
+                it.client._ui_queue.get_nowait(),
+                [
+                    (
+                        "info",
+                        "hdl_checker server is using 2 MiB of memory, restarting it",
+                    )
+                ],
+            )
+            it.assertTrue(it.client._ui_queue.empty())
+
+            it.client._stopped.set()
+            it.servers[1].kill()
+            thread.join(5)
+
+        @it.should("not restart shared servers started by other Vim instances")
+        def test():
+            it.servers.append(subp.Popen(["sleep", "30"]))
+            it.client._server = ProcessHandle(it.servers[-1].pid)
+            sample = ResourceSample(time.time(), 0, 2 * 1024 * 1024, 0, 0)
+            it.client._recycleServer(sample)
+
+            it.assertFalse(it.client._recycling)
+            it.assertIsNone(it.servers[-1].poll())
+            it.assertEqual(
+                it.client._ui_queue.get_nowait(),
+                [("warning", "hdl_checker server is using 2 MiB of memory")],
+            )
+
+        @it.should("give up if the server can't be restarted")
+        def test():
+            with mock.patch.object(
+                it.client, "_waitForServerSetup", return_value=False
+            ):
+                it.client._superviseServer()
+
+            it.assertEqual(len(it.servers), 2)
+            it.assertFalse(it.client._restarted)
+            it.assertIs(it.client._server_up, False)
+
+
+it.createTests(globals())
@@ -21,6 +21,10 @@ import sys
 import os
 import os.path as p
 import logging
+import shutil
+import subprocess as subp
+import tempfile
+import unittest
 from nose2.tools import such
 
 try:  # Python 3.x
@@ -103,6 +107,66 @@ with such.A('vim_helpers module') as it:
         vim.command.assert_called_with(
             "echohl ErrorMsg | echom 'Some error' | echohl None")
 
+    with it.having("a list of dicts to send to Vim"):
+        @it.has_test_setup
+        def setup():
+            vim.command.reset_mock()
+            it.items = [
+                {'text': 'it\'s a "quoted" \\ text', 'lnum': 1},
+                {'text': 'plain', 'lnum': 2},
+            ]
+
+        @it.has_test_teardown
+        def teardown():
+            vim_helpers._HAS_JSON_DECODE = None
+
+        @it.should("use a single command when json_decode is available")
+        def test():
+            vim_helpers._HAS_JSON_DECODE = True
+            vim_helpers.toVimList(it.items, 'l:list')
+            vim.command.assert_called_once_with(
+                "let l:list += json_decode('[{\"text\": \"it''s a "
+                "\\\"quoted\\\" \\\\ text\", \"lnum\": \"1\"}, "
+                "{\"text\": \"plain\", \"lnum\": \"2\"}]')")
+
+        @it.should("convert dicts one by one when json_decode is not "
+                   "available")
+        def test():
+            vim_helpers._HAS_JSON_DECODE = False
+            vim_helpers.toVimList(it.items, 'l:list')
+            it.assertEqual(vim.command.call_count, 2 * 4 + 1)
+            vim.command.assert_called_with("unlet! _dict")
+
+        @it.should("produce the same list as toVimDict in Vim")
+        def test():
+            vim_path = shutil.which('vim')
+            if vim_path is None:
+                raise unittest.SkipTest("Vim is not available")
+
+            it.items += [{'text': "''\"'\\n\u00e9\U0001f600|", 'lnum': 3}]
+            commands = ['let l:bulk = []', 'let l:single = []']
+
+            vim_helpers._HAS_JSON_DECODE = True
+            vim_helpers.toVimList(it.items, 'l:bulk')
+            vim_helpers._HAS_JSON_DECODE = False
+            vim_helpers.toVimList(it.items, 'l:single')
+            commands += [x[0][0] for x in vim.command.call_args_list]
+
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                script = p.join(tmp_dir, 'script.vim')
+                result = p.join(tmp_dir, 'result')
+                with open(script, 'w', encoding='utf-8') as fd:
+                    fd.write('\n'.join(
+                        ['set encoding=utf-8', 'function! Check() abort'] +
+                        commands +
+                        ["  call writefile([string(l:bulk == l:single), "
+                         "len(l:bulk)], '%s')" % result,
+                         'endfunction', 'call Check()', 'qall!', '']))
+                subp.run([vim_path, '-Nu', 'NONE', '-es', '-S', script],
+                         timeout=30, check=False)
+                with open(result) as fd:
+                    it.assertEqual(fd.read().split(), ['1', '3'])
+
     with it.having("both global and local project files configured"):
         def deleteProjectFiles():
             for prj_filename in (it._global_prj_filename,
@@ -266,4 +330,49 @@ with such.A('vim_helpers module') as it:
             it.assertIsNone(vim_helpers.getProjectFile())
             deleteProjectFiles()
 
+    with it.having("a runtime directory"):
+
+        @it.has_setup
+        def setup():
+            it._base_dir = tempfile.mkdtemp()
+            it._environ = dict(os.environ)
+            os.environ['XDG_RUNTIME_DIR'] = it._base_dir
+            it._runtime_dir = p.join(it._base_dir, 'vimhdl-%d' % os.getuid())
+
+        @it.has_teardown
+        def teardown():
+            os.environ.clear()
+            os.environ.update(it._environ)
+            shutil.rmtree(it._base_dir)
+
+        @it.has_test_teardown
+        def teardown():
+            if p.islink(it._runtime_dir):
+                os.remove(it._runtime_dir)
+            elif p.exists(it._runtime_dir):
+                os.rmdir(it._runtime_dir)
+
+        @it.should("create it private to the current user")
+        def test():
+            it.assertEqual(vim_helpers.getRuntimeDir(), it._runtime_dir)
+            it.assertEqual(os.stat(it._runtime_dir).st_mode & 0o777, 0o700)
+            # Existing private directories are reused
+            it.assertEqual(vim_helpers.getRuntimeDir(), it._runtime_dir)
+
+        @it.should("refuse existing directories other users can access")
+        def test():
+            os.mkdir(it._runtime_dir)
+            os.chmod(it._runtime_dir, 0o777)
+            with it.assertRaises(OSError):
+                vim_helpers.getRuntimeDir()
+
+        @it.should("refuse symlinks")
+        def test():
+            target = p.join(it._base_dir, 'target')
+            os.mkdir(target, 0o700)
+            os.symlink(target, it._runtime_dir)
+            with it.assertRaises(OSError):
+                vim_helpers.getRuntimeDir()
+            os.rmdir(target)
+
 it.createTests(globals())
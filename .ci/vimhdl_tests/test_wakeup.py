@@ -0,0 +1,89 @@
+# This file is part of vim-hdl.
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+
+# pylint: disable=function-redefined, missing-docstring, protected-access
+
+import logging
+import os.path as p
+import socket
+import sys
+import time
+
+from nose2.tools import such
+
+_logger = logging.getLogger(__name__)
+
+
+def _setupPaths():
+    base_path = p.abspath(p.join(p.dirname(__file__), "..", ".."))
+    for path in (p.join(base_path, "python"),):
+        assert p.exists(path), "Path '%s' doesn't exists!" % path
+        sys.path.insert(0, path)
+
+
+_setupPaths()
+
+# pylint: disable=import-error,wrong-import-position
+from vimhdl_tests.vim_mock import mockVim
+mockVim()
+from vimhdl.async_client import EventLoopThread
+from vimhdl.wakeup import WakeUpServer
+
+# pylint: enable=import-error,wrong-import-position
+
+
+def _waitUntil(condition):
+    for _ in range(100):
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+with such.A("wake up server") as it:
+
+    @it.has_test_setup
+    def setup():
+        it.wakeup = WakeUpServer(EventLoopThread())
+        host, port = it.wakeup.start().split(":")
+        it.sock = socket.create_connection((host, int(port)), timeout=5)
+        it.assertTrue(_waitUntil(lambda: it.wakeup.isConnected))
+
+    @it.has_test_teardown
+    def teardown():
+        it.sock.close()
+        it.wakeup.close()
+
+    @it.should("keep the same address once started")
+    def test():
+        it.assertEqual(it.wakeup.start(), it.wakeup.address)
+
+    @it.should("coalesce wake ups until cleared")
+    def test():
+        it.wakeup.wake()
+        it.wakeup.wake()
+        it.assertEqual(it.sock.recv(1024), b"wake\n")
+
+        it.wakeup.clear()
+        it.wakeup.wake()
+        it.assertEqual(it.sock.recv(1024), b"wake\n")
+
+    @it.should("forget Vim once it disconnects")
+    def test():
+        it.sock.close()
+        it.assertTrue(_waitUntil(lambda: not it.wakeup.isConnected))
+
+
+it.createTests(globals())
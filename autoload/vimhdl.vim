@@ -45,11 +45,35 @@ endfunction "}
 function! s:postInfo(msg) abort "{ function!
     redraw | echom a:msg | echohl None
 endfunction "}
+" { s:getClientOptions() Options to create the vim-hdl client with
+" ============================================================================
+function! s:getClientOptions() abort
+    return {
+                \ 'log_level'  : get(g:, 'vimhdl_log_level', 'INFO'),
+                \ 'log_target' : get(g:, 'vimhdl_log_file', ''),
+                \ 'pool_size'  : get(g:, 'vimhdl_pool_size', 4),
+                \ 'transport'  : get(g:, 'vimhdl_transport', ''),
+                \ 'workers'    : get(g:, 'vimhdl_workers', 2),
+                \ 'max_pending': get(g:, 'vimhdl_max_pending_requests', 8),
+                \ 'wire_format': get(g:, 'vimhdl_wire_format', 'form'),
+                \ 'push'       : get(g:, 'vimhdl_push_notifications', 1),
+                \ 'cache_size' : get(g:, 'vimhdl_cache_size', 64),
+                \ 'check_as_you_type': get(g:, 'vimhdl_check_as_you_type', 0),
+                \ 'shared_server': get(g:, 'vimhdl_shared_server', 0),
+                \ 'shutdown_timeout': get(g:, 'vimhdl_shutdown_timeout', 2),
+                \ 'auto_restart': get(g:, 'vimhdl_auto_restart', 1),
+                \ 'nice'       : get(g:, 'vimhdl_server_nice', 0),
+                \ 'io_class'   : get(g:, 'vimhdl_server_io_class', ''),
+                \ 'memory_limit': get(g:, 'vimhdl_server_memory_limit', 0),
+                \ 'monitor_interval': get(g:, 'vimhdl_monitor_interval', 60),
+                \ 'max_memory' : get(g:, 'vimhdl_server_max_memory', 0),
+                \ }
+endfunction
+" }
 " { s:setupPython() Setup Vim's Python environment to call vim-hdl within Vim
 " ============================================================================
 function! s:setupPython() abort
-    let l:log_level = get(g:, 'vimhdl_log_level', 'INFO')
-    let l:log_file = get(g:, 'vimhdl_log_file', '')
+    let l:options = s:getClientOptions()
 
     exec s:python_until_eof
 import sys
@@ -78,10 +102,7 @@ try:
     vimhdl_client
     _logger.warning("vimhdl client already exists, skiping")
 except NameError:
-    vimhdl_client = vimhdl.VimhdlClient(
-        log_level=vim.eval('l:log_level'),
-        log_target=vim.eval('l:log_file'),
-    )
+    vimhdl_client = vimhdl.VimhdlClient(**vim.eval('l:options'))
 EOF
 
 endfunction
@@ -107,9 +128,31 @@ function! s:setupHooks(...) abort
                     \'CursorMovedI', 'CursorHold', 'CursorHoldI',
                     \'InsertEnter']
             execute('autocmd! ' . l:event . ' ' . l:ext . ' ' .
-                   \':' . s:python_command . ' vimhdl_client.requestUiMessages(''' . l:event . ''')')
+                   \'call s:requestUiMessages(''' . l:event . ''')')
         endfor
+        " Writing a file may change diagnostics of files that depend on it
+        execute('autocmd! BufWritePre ' . l:ext . ' ' .
+               \':' . s:python_command . ' vimhdl_client.clearCache()')
+        execute('autocmd! BufWipeout ' . l:ext . ' ' .
+               \':' . s:python_command . ' vimhdl_client.clearCache(vim.eval(''expand("<afile>:p")''))')
+        if get(g:, 'vimhdl_check_as_you_type', 0) && has('timers')
+            execute('autocmd! TextChanged,TextChangedI ' . l:ext .
+                   \' call s:scheduleCheck()')
+        endif
+        if has('timers')
+            " Not using autocmd! to keep the BufWritePost hook set above
+            execute('autocmd BufWritePost ' . l:ext .
+                   \' call s:schedulePrefetch(expand(''<abuf>''))')
+        endif
     endfor
+    " Restoring a session may open many HDL files at once
+    autocmd! SessionLoadPost * call s:prefetchMessages([])
+    if s:usingNativeRenderer()
+        for l:ext in a:000
+            execute('autocmd! BufEnter ' . l:ext . ' call s:renderDiagnostics()')
+            execute('autocmd BufWritePost ' . l:ext . ' call s:renderDiagnostics()')
+        endfor
+    endif
     augroup END
 endfunction
 " }
@@ -145,17 +188,13 @@ function! s:restartServer() abort
     endif
     echom 'Restarting HDL Checker server'
 
-    let l:log_level = get(g:, 'vimhdl_log_level', 'INFO')
-    let l:log_file = get(g:, 'vimhdl_log_file', v:null)
+    let l:options = s:getClientOptions()
 
     exec s:python_until_eof
 _logger.info("Restarting HDL Checker server")
 vimhdl_client.shutdown()
 del vimhdl_client
-vimhdl_client = vimhdl.VimhdlClient(
-    log_level=vim.eval('l:log_level'),
-    log_target=vim.eval('l:log_file'),
-)
+vimhdl_client = vimhdl.VimhdlClient(**vim.eval('l:options'))
 EOF
     unlet! g:vimhdl_server_started
     call s:startServer()
@@ -172,6 +211,8 @@ try:
 except:
     _logger.exception("Error getting messages")
 EOF
+    " Buffers are checked in the background while the server is starting
+    call s:updateEventTimer()
     return l:loclist
 endfunction
 "}
@@ -228,7 +269,9 @@ function! vimhdl#setup() abort
         call s:setupPython()
         call s:setupCommands()
         call s:setupHooks('*.vhd', '*.vhdl', '*.v', '*.sv')
-        call s:setupSyntastic('vhdl', 'verilog', 'systemverilog')
+        if !s:usingNativeRenderer()
+            call s:setupSyntastic('vhdl', 'verilog', 'systemverilog')
+        endif
     endif
 
     if count(['vhdl', 'verilog', 'systemverilog'], &filetype)
@@ -245,7 +288,194 @@ function! s:startServer() abort
 
     let g:vimhdl_server_started = 1
     call s:pyEval('bool(vimhdl_client.startServer())')
+    call s:openWakeUpChannel()
+    call s:startEventTimer()
+    if s:usingNativeRenderer()
+        call s:renderDiagnostics()
+    endif
 
 endfunction
 "}
+" { s:requestUiMessages() Polls UI messages on editor events
+" ============================================================================
+function! s:requestUiMessages(event) abort
+    if s:pyEval('bool(vimhdl_client.requestUiMessages(''' . a:event . '''))')
+        call s:startEventTimer()
+    endif
+endfunction
+"}
+" { s:startEventTimer() Handles events pushed by the server periodically
+" ============================================================================
+function! s:startEventTimer() abort
+    " The timer is restarted by s:handleServerEvents until there's nothing
+    " left to wait for
+    if exists('s:event_timer') || !has('timers')
+        return
+    endif
+    let s:event_timer = timer_start(get(s:, 'event_delay', 100),
+                \ function('s:handleServerEvents'))
+endfunction
+"}
+" { s:updateEventTimer() Starts the event timer if there's anything to wait for
+" ============================================================================
+function! s:updateEventTimer() abort
+    " Something has just been requested, don't wait long for it
+    let s:event_delay = 100
+    if exists('s:event_timer')
+        call timer_stop(s:event_timer)
+        unlet s:event_timer
+    endif
+    if s:pyEval('bool(vimhdl_client.needsEvents())')
+        call s:startEventTimer()
+    endif
+endfunction
+"}
+" { s:openWakeUpChannel() Lets the client wake Vim up when there are events
+" ============================================================================
+function! s:openWakeUpChannel() abort
+    call s:closeWakeUpChannel()
+    if !has('nvim') && !has('channel')
+        return
+    endif
+    let l:address = s:pyEval('vimhdl_client.getWakeUpAddress()')
+    if empty(l:address)
+        return
+    endif
+    try
+        if has('nvim')
+            let s:wakeup_channel = sockconnect('tcp', l:address,
+                        \ {'on_data': function('s:onWakeUp')})
+        else
+            let l:channel = ch_open(l:address, {'mode': 'nl',
+                        \ 'callback': function('s:onWakeUp')})
+            if ch_status(l:channel) ==# 'open'
+                let s:wakeup_channel = l:channel
+            endif
+        endif
+    catch
+        " Events are then polled via the event timer
+    endtry
+endfunction
+"}
+" { s:closeWakeUpChannel() Closes the channel opened by s:openWakeUpChannel
+" ============================================================================
+function! s:closeWakeUpChannel() abort
+    if !exists('s:wakeup_channel')
+        return
+    endif
+    if has('nvim')
+        silent! call chanclose(s:wakeup_channel)
+    else
+        silent! call ch_close(s:wakeup_channel)
+    endif
+    unlet s:wakeup_channel
+endfunction
+"}
+" { s:onWakeUp() Handles events once the client wakes Vim up
+" ============================================================================
+function! s:onWakeUp(...) abort
+    call s:processServerEvents()
+    call s:updateEventTimer()
+endfunction
+"}
+" { s:handleServerEvents() Handles events while the event timer runs
+" ============================================================================
+function! s:handleServerEvents(timer) abort
+    unlet! s:event_timer
+    if s:processServerEvents()
+        let s:event_delay = 100
+    else
+        " Back off while nothing is reported
+        let s:event_delay = min([2 * get(s:, 'event_delay', 100), 2000])
+    endif
+    " Nothing will be reported until the user does something else
+    if s:pyEval('bool(vimhdl_client.needsEvents())')
+        call s:startEventTimer()
+    endif
+endfunction
+"}
+" { s:processServerEvents() Posts UI messages and refreshes diagnostics
+" ============================================================================
+function! s:processServerEvents() abort
+    let l:refresh = s:pyEval('bool(vimhdl_client.handleServerEvents())')
+    if !l:refresh
+        return 0
+    endif
+    if s:usingNativeRenderer()
+        call s:renderDiagnostics()
+    " Don't get in the way while the user is typing
+    elseif mode() ==# 'n' && exists(':SyntasticCheck') == 2
+        SyntasticCheck
+    endif
+    return 1
+endfunction
+"}
+" { s:usingNativeRenderer() Checks if diagnostics are shown without Syntastic
+" ============================================================================
+function! s:usingNativeRenderer() abort
+    return get(g:, 'vimhdl_renderer', 'syntastic') ==# 'native'
+endfunction
+"}
+" { s:renderDiagnostics() Shows diagnostics of the current buffer
+" ============================================================================
+function! s:renderDiagnostics() abort
+    if !(exists('g:vimhdl_server_started') && g:vimhdl_server_started)
+        return
+    endif
+    " Filled from Python if diagnostics are available
+    let l:items = []
+    call s:pyEval('bool(vimhdl_client.requestDiagnostics())')
+    call s:updateEventTimer()
+endfunction
+"}
+" { s:scheduleCheck() Checks the buffer once the user stops typing
+" ============================================================================
+function! s:scheduleCheck() abort
+    if exists('s:check_timer')
+        call timer_stop(s:check_timer)
+    endif
+    let s:check_timer = timer_start(get(g:, 'vimhdl_check_delay', 500),
+                \ function('s:checkBuffer'))
+endfunction
+"}
+" { s:checkBuffer() Sends the buffer contents to be checked in the background
+" ============================================================================
+function! s:checkBuffer(timer) abort
+    unlet! s:check_timer
+    call s:pyEval('bool(vimhdl_client.checkBuffer())')
+    call s:updateEventTimer()
+endfunction
+"}
+" { s:schedulePrefetch() Prefetches messages for files written by a command
+" ============================================================================
+function! s:schedulePrefetch(bufnr) abort
+    let s:written = add(get(s:, 'written', []), str2nr(a:bufnr))
+    if !exists('s:prefetch_timer')
+        " Runs once the command that wrote the files (e.g. :wa) is done
+        let s:prefetch_timer = timer_start(0, function('s:prefetchWritten'))
+    endif
+endfunction
+"}
+" { s:prefetchWritten() Prefetches messages for files written by a command
+" ============================================================================
+function! s:prefetchWritten(timer) abort
+    unlet! s:prefetch_timer
+    let l:buffers = uniq(sort(s:written))
+    let s:written = []
+    " A single file is checked via Syntastic as usual
+    if len(l:buffers) > 1
+        call s:prefetchMessages(l:buffers)
+    endif
+endfunction
+"}
+" { s:prefetchMessages() Requests messages for many HDL buffers at once
+" ============================================================================
+function! s:prefetchMessages(buffers) abort
+    if !(exists('g:vimhdl_server_started') && g:vimhdl_server_started)
+        return
+    endif
+    let l:numbers = empty(a:buffers) ? 'None' : string(a:buffers)
+    call s:pyEval('bool(vimhdl_client.prefetchMessages(' . l:numbers . '))')
+endfunction
+"}
 " vim: set foldmarker={,} foldlevel=0 foldmethod=marker :
@@ -0,0 +1,153 @@
+" This file is part of vim-hdl.
+"
+" Copyright (c) 2015-2016 Andre Souto
+"
+" vim-hdl is free software: you can redistribute it and/or modify
+" it under the terms of the GNU General Public License as published by
+" the Free Software Foundation, either version 3 of the License, or
+" (at your option) any later version.
+"
+" vim-hdl is distributed in the hope that it will be useful,
+" but WITHOUT ANY WARRANTY; without even the implied warranty of
+" MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+" GNU General Public License for more details.
+"
+" You should have received a copy of the GNU General Public License
+" along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"
+" Shows diagnostics on the location list, signs and text properties (Vim) or
+" extmarks (Neovim) without going through Syntastic
+
+" Number of signs and highlights added per timer callback
+let s:chunk_size = get(g:, 'vimhdl_render_chunk_size', 500)
+let s:sign_group = 'vimhdl'
+" Pending signs and highlights per buffer number
+let s:pending = {}
+
+sign define vimhdl_error text=E> texthl=ErrorMsg
+sign define vimhdl_warning text=W> texthl=WarningMsg
+
+if has('nvim')
+    let s:namespace = nvim_create_namespace('vimhdl')
+elseif has('textprop')
+    for s:type in ['error', 'warning']
+        if empty(prop_type_get('vimhdl_' . s:type))
+            call prop_type_add('vimhdl_' . s:type, {
+                        \ 'highlight': s:type ==# 'error' ? 'SpellBad' : 'SpellCap',
+                        \ 'combine': 1})
+        endif
+    endfor
+    unlet s:type
+endif
+
+" { s:kind() Either 'error' or 'warning'
+" ============================================================================
+function! s:kind(item) abort
+    return a:item['type'] =~? '^e' ? 'error' : 'warning'
+endfunction
+" }
+" { s:clear() Removes signs and highlights from a buffer
+" ============================================================================
+function! s:clear(bufnr) abort
+    if exists('*sign_unplace')
+        call sign_unplace(s:sign_group, {'buffer': a:bufnr})
+    else
+        execute 'sign unplace * group=' . s:sign_group . ' buffer=' . a:bufnr
+    endif
+
+    if has('nvim')
+        call nvim_buf_clear_namespace(a:bufnr, s:namespace, 0, -1)
+    elseif has('textprop')
+        for l:type in ['vimhdl_error', 'vimhdl_warning']
+            call prop_remove({'type': l:type, 'bufnr': a:bufnr, 'all': 1})
+        endfor
+    endif
+endfunction
+" }
+" { s:highlight() Adds a text property or extmark for an item
+" ============================================================================
+function! s:highlight(bufnr, item) abort
+    let l:lnum = str2nr(a:item['lnum'])
+    let l:line = get(getbufline(a:bufnr, l:lnum), 0, v:null)
+    if l:line is v:null
+        return
+    endif
+    let l:col = min([max([str2nr(a:item['col']), 1]), len(l:line) + 1])
+
+    if has('nvim')
+        call nvim_buf_set_extmark(a:bufnr, s:namespace, l:lnum - 1, l:col - 1, {
+                    \ 'end_col': len(l:line),
+                    \ 'hl_group': s:kind(a:item) ==# 'error' ? 'SpellBad' : 'SpellCap',
+                    \ 'virt_text': [[a:item['text'], 'Comment']]})
+    elseif has('textprop')
+        call prop_add(l:lnum, l:col, {
+                    \ 'type': 'vimhdl_' . s:kind(a:item),
+                    \ 'bufnr': a:bufnr,
+                    \ 'length': len(l:line) - l:col + 1})
+    endif
+endfunction
+" }
+" { s:applyChunk() Adds signs and highlights for the next chunk of items
+" ============================================================================
+function! s:applyChunk(bufnr, ...) abort
+    let l:pending = get(s:pending, a:bufnr, {})
+    if empty(l:pending) || !bufloaded(a:bufnr)
+        silent! unlet s:pending[a:bufnr]
+        return
+    endif
+
+    let l:chunk = l:pending['items'][l:pending['index'] :
+                \ l:pending['index'] + s:chunk_size - 1]
+    let l:pending['index'] += s:chunk_size
+
+    let l:signs = map(copy(l:chunk), {_, item -> {
+                \ 'buffer': a:bufnr,
+                \ 'group': s:sign_group,
+                \ 'lnum': str2nr(item['lnum']),
+                \ 'name': 'vimhdl_' . s:kind(item)}})
+    if exists('*sign_placelist')
+        call sign_placelist(l:signs)
+    else
+        for l:sign in l:signs
+            call sign_place(0, l:sign['group'], l:sign['name'], a:bufnr,
+                        \ {'lnum': l:sign['lnum']})
+        endfor
+    endif
+
+    for l:item in l:chunk
+        try
+            call s:highlight(a:bufnr, l:item)
+        catch
+            " Buffer may have changed since the items were computed
+        endtry
+    endfor
+
+    if l:pending['index'] >= len(l:pending['items'])
+        unlet s:pending[a:bufnr]
+    elseif has('timers')
+        call timer_start(0, function('s:applyChunk', [a:bufnr]))
+    else
+        call s:applyChunk(a:bufnr)
+    endif
+endfunction
+" }
+" { vimhdl#render#apply() Shows items, a list of location list entries
+" ============================================================================
+function! vimhdl#render#apply(bufnr, items) abort
+    for l:winid in win_findbuf(a:bufnr)
+        call setloclist(l:winid, [], 'r', {'title': 'vimhdl', 'items': a:items})
+    endfor
+
+    call s:clear(a:bufnr)
+
+    " Signs and highlights are added in chunks so that Vim remains
+    " responsive, starting over if the buffer is rendered again in the
+    " meantime
+    let l:is_running = has_key(s:pending, a:bufnr)
+    let s:pending[a:bufnr] = {'items': a:items, 'index': 0}
+    if !l:is_running
+        call s:applyChunk(a:bufnr)
+    endif
+endfunction
+" }
+" vim: set foldmarker={,} foldlevel=0 foldmethod=marker :
@@ -0,0 +1,361 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Event loop running on a background thread and a minimal HTTP/1.1 client that
+runs on it, talking to the server over either TCP or a Unix socket
+"""
+
+import asyncio
+import logging
+import zlib
+from collections import deque
+from threading import Lock, Thread, current_thread
+
+_logger = logging.getLogger(__name__)
+
+
+class EventLoopThread(object):  # pylint: disable=useless-object-inheritance
+    """
+    asyncio event loop running forever on a daemon thread. The thread is only
+    started when the loop is first needed
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = Lock()
+
+    def _getLoop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = Thread(
+                    target=self._loop.run_forever, name="vimhdl_event_loop"
+                )
+                self._thread.daemon = True
+                self._thread.start()
+            return self._loop
+
+    @property
+    def isRunning(self):
+        "Checks if the loop thread has been started"
+        return self._loop is not None
+
+    def isCurrentThread(self):
+        "Checks if the caller is running on the loop thread"
+        return self._thread is not None and current_thread() is self._thread
+
+    def run(self, coro):
+        """
+        Schedules coroutine coro to run on the loop, returns a
+        concurrent.futures.Future with its result
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._getLoop())
+
+    def callSoon(self, func, *args):
+        "Schedules func(*args) to be called from the loop thread"
+        self._getLoop().call_soon_threadsafe(func, *args)
+
+
+class HttpResponse(object):  # pylint: disable=useless-object-inheritance
+    """
+    Status, headers (with lower case names) and body of a response
+    """
+
+    def __init__(self, status_code, reason, headers, content):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+
+    @property
+    def ok(self):  # pylint: disable=invalid-name
+        return 200 <= self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    @property
+    def keepAlive(self):
+        "Checks if the server will keep the connection open"
+        return self.headers.get("connection", "").lower() != "close"
+
+
+def _decompress(encoding, content):
+    """
+    Handles Content-Encoding of responses
+    """
+    if encoding == "gzip":
+        return zlib.decompress(content, 16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(content)
+        except zlib.error:
+            # Some servers send raw deflate streams
+            return zlib.decompress(content, -zlib.MAX_WBITS)
+    return content
+
+
+class _BodyReader(object):  # pylint: disable=useless-object-inheritance
+    """
+    Reads the body of a response as it's received
+    """
+
+    def __init__(self, reader, headers):
+        self._reader = reader
+        self._chunked = headers.get("transfer-encoding", "").lower() == "chunked"
+        self._length = headers.get("content-length", None)
+        self._done = False
+
+    async def read(self):
+        """
+        Returns the next part of the body, b"" once it's over
+        """
+        if self._done:
+            return b""
+
+        if self._chunked:
+            size = int((await self._reader.readline()).split(b";")[0], 16)
+            if size:
+                data = await self._reader.readexactly(size)
+                await self._reader.readline()
+                return data
+            # Skip trailers
+            while (await self._reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            self._done = True
+            return b""
+
+        if self._length is not None:
+            self._done = True
+            return await self._reader.readexactly(int(self._length))
+
+        data = await self._reader.read(65536)
+        self._done = not data
+        return data
+
+    async def readAll(self):
+        parts = []
+        while True:
+            data = await self.read()
+            if not data:
+                return b"".join(parts)
+            parts.append(data)
+
+
+class _LineStream(object):  # pylint: disable=useless-object-inheritance
+    """
+    Async iterator over the non empty lines of the body of a response, the
+    connection is closed once it's exhausted
+    """
+
+    def __init__(self, body, writer):
+        self._body = body
+        self._writer = writer
+        self._lines = deque()
+        self._pending = b""
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._lines:
+            if self._body is None:
+                raise StopAsyncIteration
+            try:
+                data = await self._body.read()
+            except BaseException:
+                self.close()
+                raise
+            if data:
+                lines = (self._pending + data).split(b"\n")
+                self._pending = lines.pop()
+            else:
+                lines = [self._pending]
+                self.close()
+            self._lines.extend(x for x in lines if x.strip())
+        return self._lines.popleft()
+
+    def close(self):
+        self._body = None
+        self._writer.close()
+
+
+class AsyncHttpClient(object):  # pylint: disable=useless-object-inheritance
+    """
+    Sends POST requests to a single server, either via host/port or via
+    socket_path. Up to pool_size connections are kept alive and reused;
+    requests wait for a connection when all of them are in use
+    """
+
+    def __init__(self, host=None, port=None, socket_path=None, pool_size=4):
+        self._host = host
+        self._port = port
+        self._socket_path = socket_path
+        self._pool_size = pool_size
+        self._idle = []
+        self._semaphore = None
+
+    def __str__(self):
+        if self._socket_path is not None:
+            return "unix:" + self._socket_path
+        return "{}:{}".format(self._host, self._port)
+
+    async def _connect(self):
+        if self._socket_path is not None:
+            return await asyncio.open_unix_connection(self._socket_path)
+        return await asyncio.open_connection(self._host, self._port)
+
+    async def post(self, path, body, headers, timeout):
+        """
+        Posts body to path, returns an HttpResponse. A connection that was
+        kept alive might have been closed by the server in the meantime (for
+        example if it has been restarted), so requests that fail on reused
+        connections are sent again on a new one
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._pool_size)
+
+        async with self._semaphore:
+            if self._idle:
+                connection = self._idle.pop()
+                try:
+                    return await asyncio.wait_for(
+                        self._exchange(connection, path, body, headers), timeout
+                    )
+                except asyncio.TimeoutError:
+                    connection[1].close()
+                    raise
+                except (OSError, EOFError) as exc:
+                    connection[1].close()
+                    _logger.debug("Connection was closed (%s), reconnecting", exc)
+
+            connection = await asyncio.wait_for(self._connect(), timeout)
+            try:
+                return await asyncio.wait_for(
+                    self._exchange(connection, path, body, headers), timeout
+                )
+            except BaseException:
+                connection[1].close()
+                raise
+
+    async def _exchange(self, connection, path, body, headers):
+        """
+        Sends the request and reads the response, returning the connection
+        to the pool if the server keeps it alive
+        """
+        reader, writer = connection
+        await self._writeRequest(writer, path, body, headers)
+
+        status, reason, response_headers = await self._readHead(reader)
+        content = await _BodyReader(reader, response_headers).readAll()
+        content = _decompress(response_headers.get("content-encoding", None), content)
+        response = HttpResponse(status, reason, response_headers, content)
+
+        if response.keepAlive:
+            self._idle.append(connection)
+        else:
+            writer.close()
+        return response
+
+    async def stream(self, path, body, headers, timeout):
+        """
+        Posts body to path on a dedicated connection that is not returned to
+        the pool. Returns a tuple with the HttpResponse (without content) and
+        an async iterator over the lines of the body as they're received,
+        which closes the connection once exhausted. The iterator is None if
+        the server responded with an error
+        """
+        reader, writer = await asyncio.wait_for(self._connect(), timeout)
+        try:
+            headers = dict(headers)
+            headers["Accept-Encoding"] = "identity"
+            await asyncio.wait_for(
+                self._writeRequest(writer, path, body, headers), timeout
+            )
+            status, reason, response_headers = await asyncio.wait_for(
+                self._readHead(reader), timeout
+            )
+        except BaseException:
+            writer.close()
+            raise
+
+        response = HttpResponse(status, reason, response_headers, b"")
+        if not response.ok:
+            writer.close()
+            return response, None
+
+        return response, _LineStream(_BodyReader(reader, response_headers), writer)
+
+    async def _writeRequest(self, writer, path, body, headers):
+        all_headers = {
+            "Host": self._host or "localhost",
+            "Content-Length": len(body),
+            "Accept-Encoding": "gzip, deflate",
+        }
+        all_headers.update(headers)
+        lines = ["POST {} HTTP/1.1".format(path)]
+        lines += ["{}: {}".format(key, value) for key, value in all_headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    @staticmethod
+    async def _readHead(reader):
+        """
+        Reads the status line and headers of a response, returns a tuple with
+        status code, reason and headers
+        """
+        status_line = await reader.readline()
+        if not status_line:
+            raise EOFError("Connection closed by the server")
+
+        version, status, reason = (
+            status_line.decode("latin-1").rstrip("\r\n").split(" ", 2) + [""]
+        )[:3]
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n"):
+                break
+            if not line:
+                raise EOFError("Connection closed while reading headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        # HTTP/1.0 servers close the connection unless told otherwise
+        if version == "HTTP/1.0" and headers.get("connection", "").lower() != (
+            "keep-alive"
+        ):
+            headers["connection"] = "close"
+
+        # Without the length, the body ends when the connection is closed
+        if (
+            "content-length" not in headers
+            and headers.get("transfer-encoding", "").lower() != "chunked"
+        ):
+            headers["connection"] = "close"
+
+        return int(status), reason.strip(), headers
+
+    def close(self):
+        """
+        Closes idle connections, must be called from the loop thread
+        """
+        while self._idle:
+            self._idle.pop()[1].close()
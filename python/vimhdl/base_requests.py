@@ -18,14 +18,30 @@
 Wrapper for vim-hdl usage within Vim's Python interpreter
 """
 
+import asyncio
 import json
 import logging
-from threading import Thread
+import zlib
 
-import requests
+from vimhdl.async_client import AsyncHttpClient, EventLoopThread
+from vimhdl.wire_format import FORM, decode, encode, getAcceptHeader, getFallback
 
 _logger = logging.getLogger(__name__)
 
+# Connection errors, timeouts and also protocol errors should the server
+# misbehave all mean there's no response
+_REQUEST_ERRORS = (asyncio.TimeoutError, OSError, EOFError, ValueError, zlib.error)
+
+# Time (in seconds) blocking requests wait on top of their timeout, as a
+# request can take more than one exchange (e.g. checking the wire format)
+_RESULT_MARGIN = 5
+
+
+def _iterSubclasses(cls):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from _iterSubclasses(subclass)
+
 
 class BaseRequest(object):  # pylint: disable=useless-object-inheritance
     """
@@ -34,7 +50,29 @@ class BaseRequest(object):  # pylint: disable=useless-object-inheritance
 
     _meth = ""
     timeout = 10
-    url = None
+    # Idempotent requests can be dropped by RequestExecutor when its queue is
+    # full
+    idempotent = False
+    pool_size = 4
+    # Format to encode payloads with. Formats other than form encoding are
+    # only used if the server lists them as supported, see _checkWireFormat
+    wire_format = FORM
+    compress = True
+    # Whether the server has been asked which formats it supports and the
+    # encodings it accepts request bodies with (i.e., if large payloads can
+    # be compressed)
+    _format_checked = False
+    _request_encodings = ()
+    # Optional endpoints are not available on every server, supported tells
+    # if the server has them (None until the first request is sent). See
+    # _checkSupport
+    optional = False
+    supported = None
+
+    # All requests are sent from the same event loop, using the same
+    # connections, so both are stored on the base class itself
+    loop = EventLoopThread()
+    _http = None
 
     def __init__(self, **kwargs):
         self.payload = kwargs
@@ -42,51 +80,197 @@ class BaseRequest(object):  # pylint: disable=useless-object-inheritance
             "Creating request for '%s' with payload '%s'", self._meth, self.payload
         )
 
+    @staticmethod
+    def setServerAddress(host=None, port=None, socket_path=None):
+        """
+        Sets the address of the server, either host and port or the path of
+        a Unix socket. Connections to the previous address are closed
+        """
+        BaseRequest.resetConnections()
+        BaseRequest._format_checked = False
+        BaseRequest._request_encodings = ()
+        for cls in _iterSubclasses(BaseRequest):
+            if cls.optional:
+                cls.supported = None
+        BaseRequest._http = AsyncHttpClient(
+            host=host,
+            port=port,
+            socket_path=socket_path,
+            pool_size=BaseRequest.pool_size,
+        )
+        _logger.info("Server address is %s", BaseRequest._http)
+
+    @staticmethod
+    def resetConnections():
+        """
+        Closes connections kept alive
+        """
+        if BaseRequest._http is not None and BaseRequest.loop.isRunning:
+            BaseRequest.loop.callSoon(BaseRequest._http.close)
+
     def sendRequestAsync(self, func=None):
         """
-        Processes the request in a separate thread and puts the
-        received request on queue Q
+        Sends the request from the event loop thread without blocking and
+        calls func with the result (from the event loop thread as well)
         """
 
-        def asyncRequest():
+        async def asyncRequest():
             """
             Simple asynchronous request wrapper
             """
             try:
-                result = self.sendRequest()
+                result = await self.send()
                 if func is not None:
                     func(result)
             except:  # pragma: no cover
                 _logger.exception("Error sending request")
                 raise
 
-        Thread(target=asyncRequest).start()
+        self.loop.run(asyncRequest())
 
     def sendRequest(self):
         """
         Blocking send request. Returns a response object should the
-        server respond. It only catches a ConnectionError exception
-        (this means the server could not be reached). In this case,
-        return is None
+        server respond. If the server could not be reached or responded with
+        an error, return is None
+        """
+        if self.loop.isCurrentThread():  # pragma: no cover
+            _logger.error("Can't block the event loop waiting for %s", self)
+            return None
+        future = self.loop.run(self.send())
+        try:
+            return future.result(self.timeout + _RESULT_MARGIN)
+        except Exception:  # pylint: disable=broad-except
+            # Errors must not reach Vim as Python tracebacks
+            future.cancel()
+            _logger.exception("Error sending request '%s'", str(self))
+            return None
+
+    async def _post(self):
+        """
+        Posts the request. The first time a format other than form encoding
+        is used, the server is asked if it supports it. Payloads the server
+        rejects as bad requests are sent again with the fallback format until
+        it's form encoded
+        """
+        if BaseRequest.wire_format != FORM and not BaseRequest._format_checked:
+            await self._checkWireFormat()
+        response = await self._postEncoded()
+        while response.status_code in (400, 415) and BaseRequest.wire_format != FORM:
+            _logger.info(
+                "Server doesn't accept %s payloads, falling back to %s",
+                BaseRequest.wire_format,
+                getFallback(BaseRequest.wire_format),
+            )
+            BaseRequest.wire_format = getFallback(BaseRequest.wire_format)
+            response = await self._postEncoded()
+        return response
+
+    async def _checkWireFormat(self):
+        """
+        Falls back from the current format until finding one listed in the
+        "wire_formats" of the server's diagnose info. Servers that don't
+        list formats (e.g. hdl_checker) only understand form encoded payloads
+        and don't tell when they can't parse a payload, they simply find no
+        fields in it. Request bodies are only compressed if "deflate" is
+        listed in "request_encodings"
+        """
+        if BaseRequest._http is None:
+            raise ConnectionError("Server address has not been set")
+        headers, body = encode({}, FORM)
+        headers["Accept"] = getAcceptHeader()
+        response = await BaseRequest._http.post(
+            "/" + RequestHdlCheckerInfo._meth, body, headers, self.timeout
+        )
+
+        formats = ()
+        encodings = ()
+        if response.ok:
+            content = Response(response).json()
+            if isinstance(content, dict):
+                formats = content.get("wire_formats", None) or ()
+                encodings = content.get("request_encodings", None) or ()
+        BaseRequest._request_encodings = tuple(encodings)
+
+        while BaseRequest.wire_format not in (FORM,) + tuple(formats):
+            _logger.info(
+                "Server doesn't support %s payloads, falling back to %s",
+                BaseRequest.wire_format,
+                getFallback(BaseRequest.wire_format),
+            )
+            BaseRequest.wire_format = getFallback(BaseRequest.wire_format)
+        BaseRequest._format_checked = True
+
+    async def _postEncoded(self):
+        """
+        Posts the request encoded in the current format
+        """
+        if BaseRequest._http is None:
+            raise ConnectionError("Server address has not been set")
+        headers, body = encode(
+            self.payload,
+            BaseRequest.wire_format,
+            self.compress and "deflate" in BaseRequest._request_encodings,
+        )
+        headers["Accept"] = getAcceptHeader()
+        return await BaseRequest._http.post(
+            "/" + self._meth, body, headers, self.timeout
+        )
+
+    def _checkSupport(self, response):
+        """
+        Records if the server has the optional endpoint the request was sent
+        to, given its response. Returns True if the response can be used
+        """
+        if response.status_code == 404:
+            _logger.info("Server doesn't have the '%s' endpoint", self._meth)
+            type(self).supported = False
+            return False
+
+        type(self).supported = True
+
+        if not response.ok:  # pragma: no cover
+            _logger.warning("Server response error: '%s'", response.text)
+            return False
+        return True
+
+    async def _postOptional(self):
+        """
+        Posts a request to an optional endpoint. Returns the response or None
+        if the request failed, in which case supported tells if it was
+        because the server doesn't have the endpoint
         """
         try:
-            response = requests.post(
-                self.url + "/" + self._meth, data=self.payload, timeout=self.timeout
+            response = await self._post()
+        except _REQUEST_ERRORS as exc:
+            _logger.warning(
+                "Sending request '%s' raised exception: '%s'", str(self), repr(exc)
             )
+            return None
+
+        if not self._checkSupport(response):
+            return None
+        return response
+
+    async def send(self):
+        """
+        Coroutine that sends the request, see sendRequest
+        """
+        try:
+            response = await self._post()
             if not response.ok:  # pragma: no cover
                 _logger.warning("Server response error: '%s'", response.text)
-                response = None
+                return None
 
-        # Both requests and urllib3 have different exceptions depending
-        # on their versions, so we'll catch any exceptions for now until
-        # we work out which ones actually happen
-        except BaseException as exc:
+        except _REQUEST_ERRORS as exc:
             _logger.warning(
-                "Sending request '%s' raised exception: '%s'", str(self), str(exc)
+                "Sending request '%s' raised exception: '%s'",
+                str(self),
+                repr(exc),
             )
             return None
 
-        return response
+        return Response(response)
 
 
 class RequestMessagesByPath(BaseRequest):
@@ -95,11 +279,45 @@ class RequestMessagesByPath(BaseRequest):
     """
 
     _meth = "get_messages_by_path"
+    idempotent = True
 
-    def __init__(self, project_file, path):
+    def __init__(self, project_file, path, generation=None, since=None):
+        # since is the version of the last result received for path, servers
+        # that support it reply with only what was added or removed
         super(RequestMessagesByPath, self).__init__(
-            project_file=project_file, path=path
+            project_file=project_file, path=path, since=since
         )
+        # Buffer state the request was created for, used by the client to
+        # tell if the results are still relevant
+        self.generation = generation
+
+
+class RequestMessagesByContent(RequestMessagesByPath):
+    """
+    Request messages for the unsaved contents of a buffer, checked as if they
+    were saved to path. Servers without the endpoint only check what's on
+    disk, so nothing is sent once the server is known not to have it
+    """
+
+    _meth = "get_messages_by_content"
+    optional = True
+
+    def __init__(self, project_file, path, content, generation=None):
+        super(RequestMessagesByContent, self).__init__(
+            project_file=project_file, path=path, generation=generation
+        )
+        self.payload = {"project_file": project_file, "path": path, "content": content}
+
+    async def send(self):
+        """
+        Returns the response or None if the request failed or the server
+        doesn't have the endpoint
+        """
+        if RequestMessagesByContent.supported is False:
+            return None
+
+        response = await self._postOptional()
+        return None if response is None else Response(response)
 
 
 class RequestQueuedMessages(BaseRequest):
@@ -108,6 +326,7 @@ class RequestQueuedMessages(BaseRequest):
     """
 
     _meth = "get_ui_messages"
+    idempotent = True
 
     def __init__(self, project_file):
         super(RequestQueuedMessages, self).__init__(project_file=project_file)
@@ -119,6 +338,7 @@ class RequestHdlCheckerInfo(BaseRequest):
     """
 
     _meth = "get_diagnose_info"
+    idempotent = True
 
     def __init__(self, project_file=None):
         super(RequestHdlCheckerInfo, self).__init__(project_file=project_file)
@@ -130,6 +350,7 @@ class ListWorkingBuilders(BaseRequest):
     """
 
     _meth = "get_working_builders"
+    idempotent = True
 
 
 class RequestProjectRebuild(BaseRequest):
@@ -143,12 +364,21 @@ class RequestProjectRebuild(BaseRequest):
         super(RequestProjectRebuild, self).__init__(project_file=project_file)
 
 
+class RequestShutdown(BaseRequest):
+    """
+    Asks the server to save its state and exit
+    """
+
+    _meth = "shutdown"
+
+
 class GetDependencies(BaseRequest):
     """
     Notifies the server that a buffer has been left
     """
 
     _meth = "get_dependencies"
+    idempotent = True
 
     def __init__(self, project_file, path):
         super(GetDependencies, self).__init__(project_file=project_file, path=path)
@@ -160,6 +390,7 @@ class GetBuildSequence(BaseRequest):
     """
 
     _meth = "get_build_sequence"
+    idempotent = True
 
     def __init__(self, project_file, path):
         super(GetBuildSequence, self).__init__(project_file=project_file, path=path)
@@ -174,5 +405,192 @@ class RunConfigGenerator(BaseRequest):
 
     def __init__(self, generator, *args, **kwargs):
         super(RunConfigGenerator, self).__init__(
-            generator=generator, args=json.dumps(args), kwargs=json.dumps(kwargs)
+            generator=generator, args=list(args), kwargs=kwargs
         )
+
+
+class SubscribeEvents(BaseRequest):
+    """
+    Keeps a connection open for the server to push events related to a
+    project as they happen. Events are sent as one JSON object per line, for
+    example {"event": "ui_messages", "ui_messages": [...]} or
+    {"event": "diagnostics_ready", "path": "..."}
+    """
+
+    _meth = "subscribe_events"
+    optional = True
+
+    def __init__(self, project_file):
+        super(SubscribeEvents, self).__init__(project_file=project_file)
+
+    async def listen(self, func, on_open=None):
+        """
+        Calls on_open once the server accepts the subscription and then func
+        with every event received, all from the event loop thread. Returns
+        False if the server doesn't push events, True when the server closes
+        the stream and None if the connection failed
+        """
+        if BaseRequest._http is None:
+            return None
+
+        headers, body = encode(self.payload, FORM)
+        headers["Accept"] = "application/x-ndjson"
+        try:
+            response, lines = await BaseRequest._http.stream(
+                "/" + self._meth, body, headers, self.timeout
+            )
+            if not self._checkSupport(response):
+                return False if SubscribeEvents.supported is False else None
+
+            if on_open is not None:
+                on_open()
+
+            async for line in lines:
+                try:
+                    event = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    _logger.warning("Ignoring malformed event %r", line)
+                    continue
+                func(event)
+
+        except _REQUEST_ERRORS as exc:
+            _logger.info("Event stream '%s' closed: '%s'", str(self), repr(exc))
+            return None
+
+        return True
+
+
+class Response(object):  # pylint: disable=useless-object-inheritance
+    """
+    Server response. The body is decoded only once, the first time json() is
+    called. Responses to requests sent within a batch are created with their
+    (already decoded) content instead
+    """
+
+    def __init__(self, raw=None, content=None):
+        self._raw = raw
+        self._content = content
+        self._decoded = raw is None
+
+    @property
+    def ok(self):  # pylint: disable=invalid-name
+        return self._raw is None or self._raw.ok
+
+    @property
+    def text(self):
+        if self._raw is None:
+            return json.dumps(self._content)
+        return self._raw.text
+
+    def json(self):
+        """
+        Decoded response content
+        """
+        if not self._decoded:
+            self._content = decode(
+                self._raw.headers.get("content-type", None), self._raw.content
+            )
+            self._decoded = True
+        return self._content
+
+
+class BatchRequest(BaseRequest):
+    """
+    Sends multiple requests in a single exchange. If the server doesn't
+    support batches, requests are sent one after the other
+    """
+
+    _meth = "batch"
+    optional = True
+
+    def __init__(self, *requests):
+        self.requests = requests
+        calls = [{"method": x._meth, "payload": x.payload} for x in requests]
+        super(BatchRequest, self).__init__(calls=calls)
+        self.idempotent = all(x.idempotent for x in requests)
+
+    async def send(self):
+        """
+        Returns a list with the response of each request, in the same order
+        they were given. Responses of requests that failed are None
+        """
+        if BatchRequest.supported is not False:
+            responses = await self._sendBatch()
+            if responses is not None:
+                return responses
+
+        responses = []
+        for request in self.requests:
+            responses.append(await request.send())
+        return responses
+
+    async def _sendBatch(self):
+        """
+        Sends all requests in a single exchange. Returns None if the server
+        doesn't support batches
+        """
+        response = await self._postOptional()
+        if response is None:
+            if BatchRequest.supported is False:
+                return None
+            return [None] * len(self.requests)
+
+        return [
+            None if x is None else Response(content=x)
+            for x in Response(response).json()["responses"]
+        ]
+
+
+class RequestMessagesByPaths(BaseRequest):
+    """
+    Request messages for multiple paths at once, letting the server build
+    them in dependency order. If the server doesn't support it, a
+    RequestMessagesByPath is sent for each path in a batch
+    """
+
+    _meth = "get_messages_by_paths"
+    idempotent = True
+    optional = True
+
+    def __init__(self, project_file, paths):
+        self.paths = list(paths)
+        super(RequestMessagesByPaths, self).__init__(
+            project_file=project_file, paths=self.paths
+        )
+
+    async def send(self):
+        """
+        Returns a list with the response for each path, in the same order
+        they were given, with the same content a RequestMessagesByPath would
+        get. Responses for paths that failed are None
+        """
+        if RequestMessagesByPaths.supported is not False:
+            responses = await self._sendMulti()
+            if responses is not None:
+                return responses
+
+        return await BatchRequest(
+            *[
+                RequestMessagesByPath(project_file=self.payload["project_file"], path=x)
+                for x in self.paths
+            ]
+        ).send()
+
+    async def _sendMulti(self):
+        """
+        Sends the request to the endpoint for multiple paths. Returns None if
+        the server doesn't have it
+        """
+        response = await self._postOptional()
+        if response is None:
+            if RequestMessagesByPaths.supported is False:
+                return None
+            return [None] * len(self.paths)
+
+        messages = Response(response).json()["messages_by_path"]
+        return [
+            None
+            if messages.get(x, None) is None
+            else Response(content={"messages": messages[x]})
+            for x in self.paths
+        ]
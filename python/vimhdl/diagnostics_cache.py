@@ -0,0 +1,89 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Cache of diagnostics already converted to location list entries
+"""
+
+import logging
+from collections import OrderedDict
+from threading import Lock
+
+_logger = logging.getLogger(__name__)
+
+
+class DiagnosticsCache(object):  # pylint: disable=useless-object-inheritance
+    """
+    Least recently used cache of location list entries per path. Each entry
+    is stored along with the state it was computed for (e.g. the buffer's
+    changedtick and the file's and project file's modification times) and
+    is only returned while the state matches. At most max_size paths are
+    kept
+    """
+
+    def __init__(self, max_size=64):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, path):
+        return path in self._entries
+
+    def get(self, path, state):
+        """
+        Returns the entries stored for path if they were stored with the same
+        state, None otherwise
+        """
+        with self._lock:
+            try:
+                stored_state, entries = self._entries[path]
+            except KeyError:
+                return None
+            if stored_state != state:
+                return None
+            self._entries.move_to_end(path)
+            return entries
+
+    def put(self, path, state, entries):
+        """
+        Stores entries for path computed for state, evicting the least
+        recently used path if the cache is full
+        """
+        if self._max_size <= 0:
+            return
+        with self._lock:
+            self._entries[path] = (state, entries)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self._max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                _logger.debug("Evicted %s", evicted)
+
+    def evict(self, path):
+        """
+        Removes entries for path
+        """
+        with self._lock:
+            self._entries.pop(path, None)
+
+    def clear(self):
+        """
+        Removes all entries
+        """
+        with self._lock:
+            self._entries.clear()
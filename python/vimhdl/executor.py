@@ -0,0 +1,235 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Fixed size pool of workers to send requests in the background and helpers to
+limit the number of requests sent
+"""
+
+import asyncio
+import logging
+from collections import deque
+from threading import Condition, Lock
+
+_logger = logging.getLogger(__name__)
+
+
+class RequestExecutor(object):  # pylint: disable=useless-object-inheritance
+    """
+    Sends requests using a fixed number of worker coroutines running on loop
+    (an EventLoopThread). Requests waiting for a worker are kept in a queue
+    of at most max_pending items. When the queue is full, the oldest
+    idempotent request is dropped to make room for the new one; if there are
+    none, idempotent requests are dropped and other requests block the caller
+    until a worker picks up a request.
+    """
+
+    def __init__(self, loop, workers=2, max_pending=8):
+        self._loop = loop
+        self._workers = workers
+        self._max_pending = max_pending
+        self._pending = deque()
+        self._running = True
+        self._lock = Condition()
+        # Only created and used from the loop thread
+        self._wakeup = None
+        self._tasks = []
+
+    def __len__(self):
+        return len(self._pending)
+
+    @property
+    def workers(self):
+        "Number of workers started so far"
+        return len(self._tasks)
+
+    def _dropOldestIdempotent(self):
+        """
+        Removes the oldest idempotent request from the queue and returns it.
+        Returns None if there are no idempotent requests in the queue
+        """
+        for item in self._pending:
+            if item[0].idempotent:
+                _logger.debug("Queue is full, dropping %s", item[0])
+                self._pending.remove(item)
+                return item
+        return None
+
+    def submit(self, request, func=None):
+        """
+        Queues request to be sent by one of the workers. func, if set, is
+        called from the loop thread with the result of request.send() or with
+        None if the request is dropped. Returns True if the request was
+        queued, False if it was dropped
+        """
+        dropped = None
+        queued = True
+        with self._lock:
+            while self._running and len(self._pending) >= self._max_pending:
+                dropped = self._dropOldestIdempotent()
+                if dropped is not None:
+                    break
+                if request.idempotent:
+                    _logger.debug("Queue is full, dropping %s", request)
+                    dropped = (request, func)
+                    queued = False
+                    break
+                # Blocking the loop thread would prevent workers from ever
+                # making room
+                if self._loop.isCurrentThread():
+                    break
+                self._lock.wait()
+
+            queued = queued and self._running
+            if queued:
+                self._pending.append((request, func))
+
+        if queued:
+            self._loop.callSoon(self._wakeUp)
+
+        # Callbacks may submit other requests, so only call them after
+        # releasing the lock
+        if dropped is not None and dropped[1] is not None:
+            dropped[1](None)
+
+        return queued
+
+    def cancel(self, predicate):
+        """
+        Removes queued requests for which predicate(request) is True. Their
+        callbacks are called with None. Requests already being sent are not
+        affected. Returns the number of requests cancelled
+        """
+        with self._lock:
+            cancelled = [x for x in self._pending if predicate(x[0])]
+            for item in cancelled:
+                self._pending.remove(item)
+            if cancelled:
+                self._lock.notify_all()
+
+        for request, func in cancelled:
+            _logger.debug("Cancelled %s", request)
+            if func is not None:
+                func(None)
+
+        return len(cancelled)
+
+    def _wakeUp(self):
+        """
+        Wakes up workers, starting them if needed. Workers are only started
+        when there are requests to process
+        """
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        while self._running and len(self._tasks) < self._workers:
+            self._tasks.append(asyncio.ensure_future(self._work()))
+        self._wakeup.set()
+
+    def _pop(self):
+        """
+        Gets the next request to send. Returns None if there are none or if
+        the executor has been shut down
+        """
+        with self._lock:
+            if not self._running or not self._pending:
+                return None
+            item = self._pending.popleft()
+            # Wake up anyone waiting for room on the queue
+            self._lock.notify_all()
+            return item
+
+    async def _work(self):
+        """
+        Worker loop, runs until shutdown is called
+        """
+        while self._running:
+            item = self._pop()
+            if item is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            request, func = item
+            try:
+                result = await request.send()
+                if func is not None:
+                    func(result)
+            except Exception:  # pylint: disable=broad-except
+                _logger.exception("Error sending request")
+
+    def shutdown(self):
+        """
+        Drops pending requests and stops workers once they finish what they're
+        currently sending
+        """
+        with self._lock:
+            self._running = False
+            self._pending.clear()
+            self._lock.notify_all()
+
+        if self._loop.isRunning:
+            self._loop.callSoon(self._wakeUp)
+
+
+class RequestCoalescer(object):  # pylint: disable=useless-object-inheritance
+    """
+    Limits requests sharing the same key to one in flight plus one follow-up.
+    Requests submitted while another one with the same key is in flight
+    replace any follow-up already waiting, which is sent as soon as the one in
+    flight finishes.
+    """
+
+    def __init__(self, executor):
+        self._executor = executor
+        self._in_flight = set()
+        self._follow_ups = {}
+        self._lock = Lock()
+
+    def submit(self, key, request, func=None):
+        """
+        Sends request via the executor unless a request with the same key is
+        in flight. Returns True if the request was sent, False if it was
+        merged into the follow-up
+        """
+        with self._lock:
+            if key in self._in_flight:
+                _logger.debug("Request for %s is in flight, merging", key)
+                self._follow_ups[key] = (request, func)
+                return False
+            self._in_flight.add(key)
+
+        self._send(key, request, func)
+        return True
+
+    def _send(self, key, request, func):
+        """
+        Submits the request and chains the follow-up (if any) once it's done
+        """
+
+        def done(result):
+            try:
+                if func is not None:
+                    func(result)
+            finally:
+                with self._lock:
+                    follow_up = self._follow_ups.pop(key, None)
+                    if follow_up is None:
+                        self._in_flight.discard(key)
+
+                if follow_up is not None:
+                    self._send(key, *follow_up)
+
+        self._executor.submit(request, done)
@@ -0,0 +1,118 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Location list entries built from messages sent by the server
+"""
+
+from operator import attrgetter
+
+
+def _toInt(value):
+    """
+    Converts value to int if possible, returns it unchanged otherwise
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class LoclistEntry(object):  # pylint: disable=useless-object-inheritance
+    """
+    Single location list entry. Numeric fields are parsed and the sort key
+    is computed only once, when the entry is created, and entries are only
+    converted to dicts when handing them to Vim
+    """
+
+    __slots__ = (
+        "lnum",
+        "col",
+        "nr",
+        "type",
+        "text",
+        "filename",
+        "bufnr",
+        "subtype",
+        "sort_key",
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self, lnum, col, nr, type_, text, filename, bufnr, subtype=None
+    ):
+        self.lnum = _toInt(lnum)
+        self.col = _toInt(col)
+        self.nr = _toInt(nr)
+        self.type = type_
+        self.text = text
+        self.filename = filename
+        self.bufnr = bufnr
+        self.subtype = subtype
+        # Errors first, then by position and error number. Fields that are
+        # not numbers don't affect the order
+        self.sort_key = (
+            1 if "Error" in type_ else 2,
+            self.lnum if isinstance(self.lnum, int) else 0,
+            self.col if isinstance(self.col, int) else 0,
+            self.nr if isinstance(self.nr, int) else 0,
+        )
+
+    @classmethod
+    def fromMessage(cls, msg, bufnr, filename):
+        """
+        Creates an entry from a message sent by the server. filename is used
+        if the message doesn't have one
+        """
+        subtype = msg.get("error_subtype", None)
+        return cls(
+            lnum=int(msg.get("line_number", 0)) + 1,
+            col=int(msg.get("column_number", 0)) + 1,
+            nr=msg.get("error_code", None) or "0",
+            type_=msg.get("severity", None) or "E",
+            text=str(msg["text"]) if msg["text"] else "",
+            filename=msg.get("filename", None) or filename,
+            bufnr=bufnr,
+            subtype=None if subtype is None else str(subtype),
+        )
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, self.toDict())
+
+    def toDict(self):
+        """
+        Returns the entry in the format used by setloclist()
+        """
+        result = {
+            "lnum": self.lnum,
+            "bufnr": self.bufnr,
+            "filename": self.filename,
+            "valid": "1",
+            "text": self.text,
+            "nr": self.nr,
+            "type": self.type,
+            "col": self.col,
+        }
+        if self.subtype is not None:
+            result["subtype"] = self.subtype
+        return result
+
+
+def sortEntries(entries):
+    """
+    Sorts entries in place using their precomputed keys
+    """
+    entries.sort(key=attrgetter("sort_key"))
+    return entries
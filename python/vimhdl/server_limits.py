@@ -0,0 +1,130 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+CPU and I/O priority and memory limit of the server process. Builders the
+server runs inherit them
+"""
+
+import logging
+import os
+import shutil
+import subprocess as subp
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # Windows
+
+_logger = logging.getLogger(__name__)
+
+# Scheduling classes accepted by ionice. The realtime class is left out as it
+# requires root privileges
+IO_CLASSES = ("best-effort", "idle")
+
+
+def _which(tool, purpose):
+    path = shutil.which(tool)
+    if path is None:
+        _logger.warning("%s not found, can't %s", tool, purpose)
+    return path
+
+
+def _formatSize(size):
+    if size in (None, -1) or (resource and size == resource.RLIM_INFINITY):
+        return "unlimited"
+    return "{} MiB".format(size // (1024 * 1024))
+
+
+class ServerLimits(object):  # pylint: disable=useless-object-inheritance
+    """
+    Niceness, I/O scheduling class and address space limit (in MiB) to start
+    the server with. Zero or empty values leave the defaults
+    """
+
+    def __init__(self, nice=0, io_class=None, memory_limit=0):
+        self.nice = int(nice or 0)
+        self.io_class = io_class or None
+        self.memory_limit = int(memory_limit or 0)
+
+        if self.io_class is not None and self.io_class not in IO_CLASSES:
+            _logger.warning("Invalid I/O class '%s', ignoring it", self.io_class)
+            self.io_class = None
+
+    def wrapCommand(self, cmd):
+        """
+        Returns cmd prefixed with nice, prlimit and ionice as needed to apply
+        the limits set. Each of them executes the next command in its own
+        process, so the PID remains the same
+        """
+        wrapper = []
+
+        # Windows uses a priority class instead, see getCreationFlags
+        if self.nice > 0 and os.name != "nt":
+            nice = _which("nice", "set the nice value")
+            if nice is not None:
+                wrapper += [nice, "-n", str(self.nice)]
+
+        if self.memory_limit > 0:
+            prlimit = _which("prlimit", "limit the memory")
+            if prlimit is not None:
+                wrapper += [prlimit, "--as={}".format(self.memory_limit * 1024 * 1024)]
+
+        if self.io_class is not None:
+            ionice = _which("ionice", "set the I/O class")
+            if ionice is not None:
+                wrapper += [ionice, "-c", str(IO_CLASSES.index(self.io_class) + 2)]
+
+        return wrapper + cmd
+
+    def getCreationFlags(self):
+        """
+        Priority class for Windows, where only the niceness is supported
+        """
+        if self.nice > 0:
+            return getattr(subp, "BELOW_NORMAL_PRIORITY_CLASS", 0)
+        return 0
+
+    def describe(self, pid):
+        """
+        Returns the limits process pid is actually running with
+        """
+        info = []
+
+        try:
+            info += ["Server nice value: %d" % os.getpriority(os.PRIO_PROCESS, pid)]
+        except (AttributeError, OSError):
+            info += ["Server nice value: %d (requested)" % self.nice]
+
+        ionice = shutil.which("ionice")
+        if ionice is not None:
+            try:
+                io_class = subp.check_output(
+                    [ionice, "-p", str(pid)], stderr=subp.STDOUT, timeout=1
+                )
+                info += ["Server I/O class: " + io_class.decode().strip()]
+            except (OSError, subp.SubprocessError):
+                pass
+
+        if resource is not None:
+            try:
+                soft, _ = resource.prlimit(pid, resource.RLIMIT_AS)
+                info += ["Server memory limit: " + _formatSize(soft)]
+            except (AttributeError, OSError):
+                limit = self.memory_limit * 1024 * 1024 or None
+                info += ["Server memory limit: %s (requested)" % _formatSize(limit)]
+
+        return info
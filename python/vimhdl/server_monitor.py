@@ -0,0 +1,149 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Periodic samples of the resources used by the server, read from /proc
+"""
+
+import logging
+import os
+import os.path as p
+import time
+from collections import deque, namedtuple
+from threading import Event, Lock, Thread
+
+_logger = logging.getLogger(__name__)
+
+# Samples above the memory limit needed before reporting it, so that short
+# spikes (e.g. while building) are tolerated
+_SAMPLES_OVER_LIMIT = 2
+
+ResourceSample = namedtuple(
+    "ResourceSample", ("timestamp", "pid", "rss", "cpu_time", "open_files")
+)
+
+
+def sampleProcess(pid, proc_dir="/proc"):
+    """
+    Returns a ResourceSample with the resident set size (in bytes), CPU time
+    (in seconds) and number of open files of process pid or None if they
+    can't be read
+    """
+    base = p.join(proc_dir, str(pid))
+    try:
+        with open(p.join(base, "stat")) as fd:
+            # The command name is in parenthesis and can contain spaces
+            fields = fd.read().rsplit(")", 1)[1].split()
+        # utime and stime are fields 14 and 15, fields start at the 3rd one
+        cpu_time = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        rss = int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+        open_files = len(os.listdir(p.join(base, "fd")))
+    except (OSError, IndexError, ValueError, AttributeError):
+        return None
+    return ResourceSample(time.time(), pid, rss, cpu_time, open_files)
+
+
+class ServerMonitor(object):  # pylint: disable=useless-object-inheritance
+    """
+    Samples the resources used by a process every interval seconds, keeping
+    the last history samples. If max_rss (in bytes) is set, on_limit is
+    called (from the monitor thread) with the sample once the process uses
+    more memory than that for a few consecutive samples
+    """
+
+    def __init__(self, interval=60, max_rss=0, history=10):
+        self.interval = interval
+        self.max_rss = max_rss
+        self._samples = deque(maxlen=history)
+        self._over_limit = 0
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread = None
+
+    def add(self, sample):
+        """
+        Stores sample, returns True if it's time to report the memory usage
+        """
+        with self._lock:
+            self._samples.append(sample)
+            if not self.max_rss or sample.rss <= self.max_rss:
+                self._over_limit = 0
+                return False
+            self._over_limit += 1
+            if self._over_limit < _SAMPLES_OVER_LIMIT:
+                return False
+            self._over_limit = 0
+            return True
+
+    def getSamples(self):
+        with self._lock:
+            return list(self._samples)
+
+    def describe(self):
+        """
+        Returns the samples stored as text. CPU usage is the average since
+        the previous sample
+        """
+        lines = []
+        previous = None
+        for sample in self.getSamples():
+            cpu = "-"
+            if previous is not None and previous.pid == sample.pid:
+                elapsed = sample.timestamp - previous.timestamp
+                if elapsed > 0:
+                    cpu = "%.1f%%" % (
+                        100 * (sample.cpu_time - previous.cpu_time) / elapsed
+                    )
+            lines += [
+                "{} pid {}: RSS {} MiB, CPU {}, {} open files".format(
+                    time.strftime("%H:%M:%S", time.localtime(sample.timestamp)),
+                    sample.pid,
+                    sample.rss // (1024 * 1024),
+                    cpu,
+                    sample.open_files,
+                )
+            ]
+            previous = sample
+        return lines
+
+    def start(self, get_pid, on_limit):
+        """
+        Starts sampling the process whose PID get_pid returns (None if there's
+        no process to sample) on a daemon thread
+        """
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._thread = Thread(
+            target=self._run, args=(get_pid, on_limit), name="vimhdl_monitor"
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self, get_pid, on_limit):
+        while not self._stopped.wait(self.interval):
+            pid = get_pid()
+            sample = None if pid is None else sampleProcess(pid)
+            if sample is None:
+                continue
+            _logger.debug("Server resources: %s", sample)
+            if self.add(sample):
+                try:
+                    on_limit(sample)
+                except Exception:  # pylint: disable=broad-except
+                    _logger.exception("Error handling %s", sample)
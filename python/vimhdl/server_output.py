@@ -0,0 +1,92 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Keeps the latest output of the server process. Its pipes must be read
+continuously, otherwise the server blocks once their buffers are full
+"""
+
+import logging
+from collections import deque
+from threading import Lock, Thread
+
+_logger = logging.getLogger(__name__)
+
+# Longer lines are split
+_MAX_LINE_LENGTH = 4096
+
+
+class OutputBuffer(object):  # pylint: disable=useless-object-inheritance
+    """
+    Lines written by the server to either stdout or stderr, dropping the
+    oldest ones once their total size exceeds max_size bytes
+    """
+
+    def __init__(self, max_size=65536):
+        self._max_size = max_size
+        self._size = 0
+        self._lines = deque()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._lines)
+
+    def append(self, stream, line):
+        """
+        Adds a line written to stream (e.g. "stdout")
+        """
+        with self._lock:
+            self._lines.append((stream, line))
+            self._size += len(line)
+            while self._size > self._max_size and self._lines:
+                self._size -= len(self._lines.popleft()[1])
+
+    def getLines(self, count=None):
+        """
+        Returns the last count lines (all if count is None) formatted as
+        "[<stream>] <line>"
+        """
+        with self._lock:
+            lines = list(self._lines)
+        if count is not None:
+            lines = lines[-count:] if count else []
+        return ["[{}] {}".format(stream, line) for stream, line in lines]
+
+    def clear(self):
+        with self._lock:
+            self._lines.clear()
+            self._size = 0
+
+    def drain(self, stream, pipe):
+        """
+        Reads pipe on a daemon thread until it's closed, adding its lines
+        as written to stream
+        """
+        thread = Thread(
+            target=self._read, args=(stream, pipe), name="vimhdl_" + stream
+        )
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _read(self, stream, pipe):
+        try:
+            for line in iter(lambda: pipe.readline(_MAX_LINE_LENGTH), b""):
+                self.append(stream, line.decode("utf-8", errors="replace").rstrip())
+        except (OSError, ValueError) as exc:
+            _logger.debug("Stopped reading %s: %s", stream, exc)
+        finally:
+            pipe.close()
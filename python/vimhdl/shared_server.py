@@ -0,0 +1,267 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Discovery of hdl_checker servers shared by Vim instances working on the same
+project. Each server is described by a JSON file listing the process IDs of
+the Vim instances using it, the last one to leave shuts it down
+"""
+
+import errno
+import hashlib
+import json
+import logging
+import os
+import os.path as p
+import signal
+import subprocess as subp
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # Windows
+
+_logger = logging.getLogger(__name__)
+
+# Seconds between checks of ProcessHandle.wait, when waiting without a
+# timeout (i.e., while the server is being supervised) and with one
+_WAIT_INTERVAL = 2
+_WAIT_TIMEOUT_INTERVAL = 0.05
+
+
+def isSupported():
+    "Sharing servers relies on fcntl file locks"
+    return fcntl is not None
+
+
+def isProcessAlive(pid):
+    """
+    Checks if a process with the given PID exists
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError as exc:
+        return exc.errno == errno.EPERM
+    return True
+
+
+def getProcessStartTime(pid):
+    """
+    Returns an opaque value telling when the process with the given PID was
+    started, so that it can be told apart from processes that reuse the PID
+    once it exits. Returns None if it can't be found
+    """
+    try:
+        with open("/proc/{}/stat".format(pid)) as fd:
+            stat = fd.read()
+    except OSError:
+        stat = None
+
+    if stat is not None:
+        # Field 22 is the start time. The command name (field 2) is wrapped
+        # in parentheses and may contain spaces
+        return stat.rsplit(")", 1)[-1].split()[19]
+
+    try:
+        output = subp.check_output(
+            ["ps", "-o", "lstart=", "-p", str(pid)], stderr=subp.DEVNULL
+        )
+    except (subp.CalledProcessError, OSError):
+        return None
+    return output.decode("utf-8", errors="replace").strip() or None
+
+
+def isSameProcess(pid, start_time):
+    """
+    Checks if the process with the given PID is still the one that was
+    started at start_time, as returned by getProcessStartTime. Only checks
+    if the process exists when start_time is None
+    """
+    if not isProcessAlive(pid):
+        return False
+    return start_time is None or getProcessStartTime(pid) == start_time
+
+
+class ProcessHandle(object):  # pylint: disable=useless-object-inheritance
+    """
+    Stands in for the subprocess.Popen object of a server started by another
+    Vim instance. Polling only checks if the PID exists, start_time is
+    checked before signalling it in case the PID got reused by another
+    process after the server exited
+    """
+
+    def __init__(self, pid, start_time=None):
+        self.pid = pid
+        self.start_time = start_time
+        self.returncode = None
+
+    def poll(self):
+        if self.returncode is None and not isProcessAlive(self.pid):
+            self.returncode = 0
+        return self.returncode
+
+    def wait(self, timeout=None):
+        """
+        Waits for the process to exit, as it's not a child of this process
+        this means polling
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.poll() is None:
+            if deadline is None:
+                time.sleep(_WAIT_INTERVAL)
+                continue
+            if time.monotonic() >= deadline:
+                raise subp.TimeoutExpired("pid {}".format(self.pid), timeout)
+            time.sleep(_WAIT_TIMEOUT_INTERVAL)
+        return self.returncode
+
+    def _signal(self, signum):
+        if self.poll() is not None:
+            return
+        if not isSameProcess(self.pid, self.start_time):
+            self.returncode = 0
+            return
+        try:
+            os.kill(self.pid, signum)
+        except OSError:
+            pass
+
+    def terminate(self):
+        self._signal(signal.SIGTERM)
+
+    def kill(self):
+        self._signal(signal.SIGKILL)
+
+
+class SharedServer(object):  # pylint: disable=useless-object-inheritance
+    """
+    Discovery file of the server shared by Vim instances working on
+    project_file, placed inside base_dir. attach, register and detach must
+    be called while holding the lock
+    """
+
+    def __init__(self, base_dir, project_file):
+        key = hashlib.sha1(str(project_file).encode("utf-8")).hexdigest()[:16]
+        self.key = key
+        self.filename = p.join(base_dir, "shared_{}.json".format(key))
+        self._lock_filename = p.join(base_dir, "shared_{}.lock".format(key))
+
+    @contextmanager
+    def lock(self):
+        """
+        Holds an exclusive lock on the discovery file, blocking until other
+        Vim instances release it
+        """
+        with open(self._lock_filename, "a") as fd:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _read(self):
+        try:
+            with open(self.filename) as fd:
+                info = json.load(fd)
+        except (OSError, ValueError):
+            return None
+        return info if isinstance(info, dict) else None
+
+    def _write(self, info):
+        tmp_name = self.filename + ".tmp"
+        with open(tmp_name, "w") as fd:
+            json.dump(info, fd)
+        os.replace(tmp_name, self.filename)
+
+    def _remove(self):
+        try:
+            os.remove(self.filename)
+        except OSError:
+            pass
+
+    def getInfo(self):
+        """
+        Returns the contents of the discovery file or None if there's no
+        server running
+        """
+        return self._read()
+
+    def attach(self, client_pid):
+        """
+        Adds client_pid to the clients of a running server. Returns the
+        information the server was registered with or None if there's no
+        server running, in which case the caller should start one and
+        register it
+        """
+        info = self._read()
+        if info is None:
+            return None
+
+        if not isSameProcess(info.get("pid", 0), info.get("start_time", None)):
+            _logger.info("Shared server %s is not running anymore", info)
+            self._remove()
+            return None
+
+        # Vim instances that have crashed never detach
+        clients = [x for x in info.get("clients", []) if isProcessAlive(x)]
+        info["clients"] = sorted(set(clients + [client_pid]))
+        self._write(info)
+        _logger.info("Attached to shared server %s", info)
+        return info
+
+    def register(self, client_pid, **info):
+        """
+        Registers a server started by client_pid. info should contain at
+        least the server's PID and its address, and its start time (see
+        getProcessStartTime) so that other clients don't mistake another
+        process for it
+        """
+        info["clients"] = [client_pid]
+        self._write(info)
+        _logger.info("Registered shared server %s", info)
+
+    def update(self, **info):
+        """
+        Updates the information of the server registered, e.g. its address
+        """
+        stored = self._read()
+        if stored is not None:
+            stored.update(info)
+            self._write(stored)
+
+    def detach(self, client_pid):
+        """
+        Removes client_pid from the clients of the server. Returns True if
+        there are no clients left, in which case the discovery file is
+        removed and the caller should stop the server
+        """
+        info = self._read()
+        if info is None:
+            return True
+
+        clients = [
+            x for x in info.get("clients", []) if x != client_pid and isProcessAlive(x)
+        ]
+        if clients:
+            info["clients"] = clients
+            self._write(info)
+            _logger.info("Detached from shared server, clients left: %s", clients)
+            return False
+
+        self._remove()
+        return True
@@ -0,0 +1,169 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+On disk cache of the output of 'hdl_checker --version', so that the extra
+interpreter startup only happens when the executable changes
+"""
+
+import json
+import logging
+import os
+import os.path as p
+import shutil
+import subprocess as subp
+import tempfile
+from concurrent import futures
+from threading import Lock, Thread
+
+_logger = logging.getLogger(__name__)
+
+
+def _getDefaultFilename():
+    base_dir = os.environ.get("XDG_CACHE_HOME", None) or p.join(
+        p.expanduser("~"), ".cache"
+    )
+    return p.join(base_dir, "vimhdl", "version_cache.json")
+
+
+def _getEnvironment():
+    """
+    Virtual environment (or conda environment) active, as the same
+    executable might run with different packages installed
+    """
+    return os.environ.get("VIRTUAL_ENV", None) or os.environ.get(
+        "CONDA_PREFIX", None
+    )
+
+
+def resolveExecutable(executable):
+    """
+    Returns the real path of executable after looking it up on PATH or None
+    if it can't be found
+    """
+    path = shutil.which(executable)
+    if path is None:
+        return None
+    return p.realpath(path)
+
+
+class VersionCache(object):  # pylint: disable=useless-object-inheritance
+    """
+    Versions reported by executables, stored on filename. Entries are keyed
+    by the resolved executable path and are only valid while the executable's
+    modification time and the active virtual environment remain the same
+    """
+
+    def __init__(self, filename=None):
+        self._filename = filename or _getDefaultFilename()
+        self._lock = Lock()
+
+    @property
+    def filename(self):
+        return self._filename
+
+    def _read(self):
+        try:
+            with open(self._filename) as fd:
+                entries = json.load(fd)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def _write(self, entries):
+        """
+        Writes entries to a temporary file and renames it so that other Vim
+        instances never read a partially written cache
+        """
+        dirname = p.dirname(self._filename)
+        try:
+            if not p.exists(dirname):
+                os.makedirs(dirname)
+            fd, tmp_name = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+            with os.fdopen(fd, "w") as tmp:
+                json.dump(entries, tmp)
+            os.replace(tmp_name, self._filename)
+        except OSError:
+            _logger.exception("Unable to write %s", self._filename)
+
+    @staticmethod
+    def _getState(path):
+        """
+        Returns the state an entry for path is valid for, None if path
+        doesn't exist
+        """
+        try:
+            mtime = p.getmtime(path)
+        except OSError:
+            return None
+        return {"mtime": mtime, "environment": _getEnvironment()}
+
+    def get(self, path):
+        """
+        Returns the version stored for the executable at path if it hasn't
+        changed since, None otherwise
+        """
+        state = self._getState(path)
+        if state is None:
+            return None
+        with self._lock:
+            entry = self._read().get(path, None)
+        if not isinstance(entry, dict) or entry.get("state", None) != state:
+            return None
+        return entry.get("version", None)
+
+    def put(self, path, version):
+        """
+        Stores the version of the executable at path
+        """
+        state = self._getState(path)
+        if state is None:
+            return
+        with self._lock:
+            entries = self._read()
+            entries[path] = {"state": state, "version": version}
+            self._write(entries)
+
+    def probe(self, path):
+        """
+        Runs the executable at path with '--version', storing and returning
+        its output. Raises subprocess.CalledProcessError if it fails
+        """
+        _logger.debug("Will run %s --version", path)
+        stdout = subp.check_output([path, "--version"], stderr=subp.STDOUT)
+        version = stdout.decode("utf-8", errors="replace").strip()
+        self.put(path, version)
+        return version
+
+    def probeInBackground(self, path):
+        """
+        Runs probe(path) on a daemon thread. Returns a
+        concurrent.futures.Future with its result
+        """
+        future = futures.Future()
+
+        def run():
+            if not future.set_running_or_notify_cancel():  # pragma: no cover
+                return
+            try:
+                future.set_result(self.probe(path))
+            except Exception as exc:  # pylint: disable=broad-except
+                future.set_exception(exc)
+
+        thread = Thread(target=run, name="vimhdl_version_probe")
+        thread.daemon = True
+        thread.start()
+        return future
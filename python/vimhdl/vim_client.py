@@ -16,55 +16,85 @@
 # along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
 "Wrapper for vim-hdl usage within Vim's Python interpreter"
 
+import asyncio
 import atexit
+import json
 import logging
 import os
 import os.path as p
 import subprocess as subp
 import sys
 import time
-from multiprocessing import Queue
-from pprint import pformat
+from collections import OrderedDict
+from concurrent import futures
+from queue import Queue
 from tempfile import NamedTemporaryFile
+from threading import Event, Lock, Thread
 
 import vim  # type: ignore # pylint: disable=import-error
 import vimhdl
+import vimhdl.shared_server as shared_server
 import vimhdl.vim_helpers as vim_helpers
-from vimhdl.base_requests import (BaseRequest, GetBuildSequence,
+from vimhdl.base_requests import (BaseRequest, BatchRequest, GetBuildSequence,
                                   GetDependencies, RequestHdlCheckerInfo,
-                                  RequestMessagesByPath, RequestProjectRebuild,
-                                  RequestQueuedMessages, RunConfigGenerator)
+                                  RequestMessagesByContent,
+                                  RequestMessagesByPath,
+                                  RequestMessagesByPaths, RequestProjectRebuild,
+                                  RequestQueuedMessages, RequestShutdown,
+                                  RunConfigGenerator, SubscribeEvents)
 from vimhdl.config_gen_wrapper import ConfigGenWrapper
+from vimhdl.diagnostics_cache import DiagnosticsCache
+from vimhdl.executor import RequestCoalescer, RequestExecutor
+from vimhdl.loclist import LoclistEntry, sortEntries
+from vimhdl.server_limits import ServerLimits
+from vimhdl.server_monitor import ServerMonitor
+from vimhdl.server_output import OutputBuffer
+from vimhdl.shared_server import ProcessHandle, SharedServer
+from vimhdl.version_cache import VersionCache, resolveExecutable
+from vimhdl.wakeup import WakeUpServer
+from vimhdl.wire_format import FORM
+from vimhdl.wire_format import isAvailable as isWireFormatAvailable
 
 _ON_WINDOWS = sys.platform == "win32"
 
+# Time to wait for the server to respond after starting it and limits for
+# the delay between probes (all in seconds)
+_SERVER_START_TIMEOUT = 10
+_SERVER_PROBE_TIMEOUT = 1
+_SERVER_PROBE_MIN_DELAY = 0.01
+_SERVER_PROBE_MAX_DELAY = 0.2
+
+# Limits for the delay before restarting a server that has exited, restart
+# attempts before giving up and how long a server must have been running for
+# the delay to be reset (all in seconds)
+_RESTART_MIN_DELAY = 1
+_RESTART_MAX_DELAY = 30
+_RESTART_MAX_ATTEMPTS = 5
+_RESTART_STABLE_TIME = 60
+
+# Number of lines of the server's output shown by getVimhdlInfo
+_SERVER_OUTPUT_INFO_LINES = 20
+
+# Same as the patterns autocmds are set up for
+_HDL_EXTENSIONS = (".vhd", ".vhdl", ".v", ".sv")
+
 _logger = logging.getLogger(__name__)
 
 
-def _sortKey(record):
+def _messageKey(message):
     """
-    Key for sorting records
+    Identifies a message from the server, used to match removed messages
     """
-    return (
-        1 if "Error" in record["type"] else 2,
-        record["lnum"] if isinstance(record["lnum"], int) else 0,
-        record["col"] if isinstance(record["col"], int) else 0,
-        record["nr"] if isinstance(record["nr"], int) else 0,
-    )
+    return json.dumps(message, sort_keys=True)
 
 
-def _sortBuildMessages(records):
+def _toEntries(messages, bufnr, filename):
     """
-    Sorts the build messages using Vim's terminology
+    Converts messages from the server into sorted location list entries
     """
-    for record in records:
-        for key in ("lnum", "nr", "col"):
-            try:
-                record[key] = int(record[key])
-            except ValueError:
-                pass
-    records.sort(key=_sortKey)
-    return records
+    return sortEntries(
+        [LoclistEntry.fromMessage(msg, bufnr, filename) for msg in messages]
+    )
 
 
 # pylint:disable=inconsistent-return-statements
@@ -84,9 +114,40 @@ class VimhdlClient:  # pylint: disable=too-many-instance-attributes
         self._logger.info("Creating vimhdl client object: %s", options)
 
         self._server = None
+        # Whether the server has responded (None while it's starting) and
+        # calls deferred until it does, by key
+        self._server_up = None
+        self._setup_done = Event()
+        self._setup_lock = Lock()
+        self._deferred = OrderedDict()
+        self._stopped = Event()
+        # Servers that exit unexpectedly are restarted, after which the open
+        # buffers' diagnostics are requested again
+        self._auto_restart = bool(int(options.get("auto_restart", 1)))
+        self._restarted = False
+        # Samples the resources used by the server, which is recycled if it
+        # uses more memory than allowed
+        self._monitor = ServerMonitor(
+            interval=float(options.get("monitor_interval", 60)),
+            max_rss=int(options.get("max_memory", 0)) * 1024 * 1024,
+        )
+        self._recycling = False
+        # Vim instances working on the same project can share a server, in
+        # which case it's only stopped when the last of them leaves
+        self._shared_server = bool(int(options.get("shared_server", 0)))
+        self._shared = None
+        # Time given to the server to exit at each step of a graceful shutdown
+        self._shutdown_timeout = float(options.get("shutdown_timeout", 2))
         # Store constructor args
         self._host = options.get("host", "localhost")
-        self._port = options.get("port", vim_helpers.getUnusedLocalhostPort())
+        self._port = options.get("port", None)
+        self._socket_path = None
+        # Unix sockets need a server with --unix-socket, so they're only used
+        # if requested (never on Windows). TCP is used if the server fails to
+        # start on a Unix socket
+        self._transport = options.get("transport", None) or "tcp"
+        if _ON_WINDOWS:
+            self._transport = "tcp"
         self._log_level = str(options.get("log_level", "DEBUG"))
         self._log_file = (
             options.get("log_target", None)
@@ -111,22 +172,352 @@ class VimhdlClient:  # pylint: disable=too-many-instance-attributes
 
         self._posted_notifications = []
 
+        # What the server writes to its stdout and stderr pipes, which must be
+        # drained for the server not to block
+        self._output = OutputBuffer(int(options.get("output_size", 65536)))
+        # Keeps the server and the builders it runs from competing with Vim
+        # and other processes
+        self._limits = ServerLimits(
+            nice=options.get("nice", 0),
+            io_class=options.get("io_class", None),
+            memory_limit=options.get("memory_limit", 0),
+        )
+
+        # 'hdl_checker --version' is only run when the executable is not in
+        # the cache, and then in parallel with the server launch
+        self._version_cache = VersionCache(options.get("version_cache", None))
+        self._version_probe = None
+
+        # Latest buffer generation diagnostics were requested for, per path
+        self._generations = {}
+        self._cache = DiagnosticsCache(int(options.get("cache_size", 64)))
+        # Version of the last messages received for each path along with
+        # their location list entries (lists per message key, as the same
+        # message can show up more than once), so that only changes need to
+        # be transferred
+        self._stored = {}
+
         self._ui_queue = Queue()
+        self._executor = RequestExecutor(
+            BaseRequest.loop,
+            workers=int(options.get("workers", 2)),
+            max_pending=int(options.get("max_pending", 8)),
+        )
+        # UI messages are requested on almost every event, avoid piling up
+        # requests for the same project
+        self._ui_requests = RequestCoalescer(self._executor)
         self.helper_wrapper = ConfigGenWrapper()
 
-        # Set url on the BaseRequest class as well
-        BaseRequest.url = "http://{}:{}".format(self._host, self._port)
+        # Servers that push events make polling for UI messages unnecessary.
+        # Subscriptions are kept per project file
+        self._push = bool(int(options.get("push", 1)))
+        self._subscriptions = {}
+        self._subscribed = set()
+        # Lets pushed events and background checks wake Vim up instead of
+        # Vim polling for them
+        self._wakeup = WakeUpServer(BaseRequest.loop)
+        # Paths the server has reported new diagnostics for
+        self._ready_paths = set()
+
+        # Check as you type sends unsaved buffer contents in the background,
+        # results are put in the cache and the paths added here
+        self._check_as_you_type = bool(int(options.get("check_as_you_type", 0)))
+        self._checked_paths = set()
+        # Generation of the background check in flight for each path, whose
+        # result handleServerEvents will report
+        self._checking = {}
+
+        BaseRequest.pool_size = int(options.get("pool_size", 4))
+        BaseRequest.wire_format = options.get("wire_format", None) or FORM
+        if not isWireFormatAvailable(BaseRequest.wire_format):
+            self._logger.warning(
+                "Wire format '%s' is not available", BaseRequest.wire_format
+            )
+            BaseRequest.wire_format = FORM
+        self._setTransport(self._transport)
 
-    def startServer(self):
+    def _setTransport(self, transport):
         """
-        Starts the hdl_checker server, waits until it responds and register
-        server shutdown when exiting Vim's Python interpreter
+        Selects how requests reach the server, either "unix" or "tcp"
         """
-        self._startServerProcess()
-        self._waitForServerSetup()
+        if transport == "unix":
+            try:
+                self._socket_path = vim_helpers.getUnixSocketPath(
+                    None if self._shared is None else "shared_" + self._shared.key
+                )
+            except OSError as exc:
+                self._logger.warning("Unable to use a Unix socket: %s", exc)
+                self._ui_queue.put(
+                    [("warning", "Unable to use a Unix socket: {}".format(exc))]
+                )
+                transport = "tcp"
+
+        self._logger.info("Transport is %s", transport)
+        self._transport = transport
+        # Connections from a previous client point to a server that is not
+        # around anymore, setting the address drops them
+        if transport == "unix":
+            BaseRequest.setServerAddress(socket_path=self._socket_path)
+        else:
+            self._socket_path = None
+            if self._port is None:
+                self._port = vim_helpers.getUnusedLocalhostPort()
+            BaseRequest.setServerAddress(host=self._host, port=self._port)
 
+    def startServer(self):
+        """
+        Starts the hdl_checker server and register server shutdown when
+        exiting Vim's Python interpreter. Vim doesn't wait for the server to
+        respond, requests made until then are deferred (see _whenReady)
+        """
+        if self._shared_server:
+            self._startSharedServer()
+        else:
+            self._startServerProcess()
+        thread = Thread(target=self._runServer, name="vimhdl_server_supervisor")
+        thread.daemon = True
+        thread.start()
+        self._monitor.start(self._getServerPid, self._recycleServer)
         atexit.register(self.shutdown)
 
+    def _startSharedServer(self):
+        """
+        Attaches to the server other Vim instances are using for the current
+        project, starting and registering one if there's none
+        """
+        if not shared_server.isSupported():
+            self._logger.warning("Shared servers are not supported here")
+            self._startServerProcess()
+            return
+
+        if self._shared is None:
+            try:
+                runtime_dir = vim_helpers.getRuntimeDir()
+            except OSError as exc:
+                self._logger.warning("Unable to share the server: %s", exc)
+                self._ui_queue.put(
+                    [("warning", "Unable to share the server: {}".format(exc))]
+                )
+                self._startServerProcess()
+                return
+            self._shared = SharedServer(runtime_dir, vim_helpers.getProjectFile())
+        with self._shared.lock():
+            info = self._shared.attach(os.getpid())
+            if info is not None:
+                self._attachToServer(info)
+                return
+
+            # Sockets of shared servers are named after the project
+            self._setTransport(self._transport)
+            self._startServerProcess()
+            if self._server is not None:
+                self._shared.register(os.getpid(), **self._getSharedInfo())
+
+    def _getSharedInfo(self):
+        """
+        Information other Vim instances need to use the server started by
+        this one
+        """
+        return {
+            "pid": self._server.pid,
+            "start_time": shared_server.getProcessStartTime(self._server.pid),
+            "transport": self._transport,
+            "host": self._host,
+            "port": self._port,
+            "log_file": self._log_file,
+            "stdout": self._stdout,
+            "stderr": self._stderr,
+        }
+
+    def _attachToServer(self, info):
+        """
+        Uses the server described by info, started by another Vim instance
+        """
+        self._server = ProcessHandle(info["pid"], info.get("start_time", None))
+        self._host = info["host"]
+        self._port = info["port"]
+        self._log_file = info["log_file"]
+        self._stdout = info["stdout"]
+        self._stderr = info["stderr"]
+        self._setTransport(info["transport"])
+
+    def _runServer(self):
+        """
+        Waits until the server responds and, if enabled, restarts it whenever
+        it exits. Runs on its own thread, so Vim can't be used here; errors
+        are queued to be posted by _postQueuedMessages
+        """
+        if self._finishServerSetup() and self._auto_restart:
+            self._superviseServer()
+
+    def _superviseServer(self):
+        """
+        Restarts the server whenever it exits until shutdown is called.
+        Calls made while restarting are deferred. Restarts are delayed
+        exponentially if the server keeps exiting, giving up after a few
+        failed attempts
+        """
+        delay = _RESTART_MIN_DELAY
+        failures = 0
+        while True:
+            started = time.monotonic()
+            self._server.wait()
+            if self._stopped.is_set():
+                return
+
+            if time.monotonic() - started >= _RESTART_STABLE_TIME:
+                delay = _RESTART_MIN_DELAY
+                failures = 0
+
+            # Servers stopped for using too much memory are restarted right
+            # away
+            recycled, self._recycling = self._recycling, False
+            if recycled:
+                self._logger.info("Server has been stopped, restarting it")
+            else:
+                self._logger.warning(
+                    "Server has exited (%s), restarting in %ss",
+                    self._server.returncode,
+                    delay,
+                )
+                self._ui_queue.put([("warning", "hdl_checker server has exited")])
+            with self._setup_lock:
+                self._server_up = None
+            self._setup_done.clear()
+
+            if self._stopped.wait(0 if recycled else delay):
+                return
+
+            BaseRequest.resetConnections()
+            if self._shared is not None:
+                self._startSharedServer()
+            else:
+                self._startServerProcess()
+
+            failures += 1
+            if not self._finishServerSetup(
+                last_attempt=failures >= _RESTART_MAX_ATTEMPTS
+            ):
+                if failures >= _RESTART_MAX_ATTEMPTS:
+                    self._logger.error("Giving up restarting the server")
+                    return
+                # Make sure the next attempt doesn't wait on a server that
+                # doesn't respond
+                if self._server.poll() is None:
+                    self._killServer(graceful=False)
+                delay = min(2 * delay, _RESTART_MAX_DELAY)
+                continue
+
+            self._logger.info("Server has been restarted")
+            self._restarted = True
+            self._wakeup.wake()
+
+    def _getServerPid(self):
+        """
+        PID of the server for the monitor to sample, None while it's not up
+        """
+        server = self._server
+        if server is None or not self.isServerReady() or server.poll() is not None:
+            return None
+        return server.pid
+
+    def _recycleServer(self, sample):
+        """
+        Stops the server gracefully so that the supervisor restarts it, called
+        from the monitor thread when the server uses too much memory. Shared
+        servers are only restarted by the Vim instance that started them
+        """
+        usage = "hdl_checker server is using {} MiB of memory".format(
+            sample.rss // (1024 * 1024)
+        )
+        if (
+            not self._auto_restart
+            or self._stopped.is_set()
+            or isinstance(self._server, ProcessHandle)
+        ):
+            self._ui_queue.put([("warning", usage)])
+            return
+        self._logger.warning("%s, restarting it", usage)
+        self._ui_queue.put([("info", usage + ", restarting it")])
+        self._recycling = True
+        # The supervisor takes care of the rest once the server exits
+        self._stopServer(self._server)
+
+    def _finishServerSetup(self, last_attempt=True):
+        """
+        Waits until the server responds, falling back to TCP if needed, and
+        then runs deferred calls. Returns True if the server is up. If
+        last_attempt is False, calls remain deferred if the server fails to
+        come up
+        """
+        is_up = self._waitForServerSetup()
+
+        # Servers that can't listen on Unix sockets will exit right away.
+        # Shared servers started by other Vim instances are left alone
+        if (
+            not is_up
+            and not self._stopped.is_set()
+            and self._transport == "unix"
+            and self._server is not None
+            and not isinstance(self._server, ProcessHandle)
+        ):
+            self._logger.warning("Server is not up, falling back to TCP")
+            if self._server.poll() is None:
+                self._killServer(graceful=False)
+            self._setTransport("tcp")
+            self._startServerProcess()
+            if self._shared is not None and self._server is not None:
+                with self._shared.lock():
+                    self._shared.update(**self._getSharedInfo())
+            is_up = self._waitForServerSetup()
+
+        if not is_up and not last_attempt:
+            return False
+
+        if not is_up and not self._stopped.is_set():
+            self._ui_queue.put([("error", self._getStartupError())])
+
+        with self._setup_lock:
+            self._server_up = is_up
+            deferred, self._deferred = self._deferred, OrderedDict()
+        self._setup_done.set()
+
+        if not is_up:
+            self._logger.info("Dropping %d deferred calls", len(deferred))
+            return False
+
+        self._logger.info("Running %d deferred calls", len(deferred))
+        for func, args in deferred.values():
+            try:
+                func(*args)
+            except Exception:  # pylint: disable=broad-except
+                self._logger.exception("Error running %s%s", func, args)
+        return True
+
+    def isServerReady(self):
+        """
+        Checks if the server has responded after being started
+        """
+        return self._server_up is True
+
+    def _whenReady(self, func, *args, key=None):
+        """
+        Calls func(*args) right away if the server is ready or once it
+        responds if it's still starting. A deferred call replaces the one
+        deferred with the same key, if any. Calls are dropped if the server
+        fails to start
+        """
+        with self._setup_lock:
+            if self._server_up is None:
+                if key is None:
+                    key = object()
+                self._deferred.pop(key, None)
+                self._deferred[key] = (func, args)
+                return
+            if not self._server_up:
+                return
+        func(*args)
+
     def _postError(self, msg):
         """
         Post errors to the user once
@@ -162,95 +553,358 @@ class VimhdlClient:  # pylint: disable=too-many-instance-attributes
 
         hdl_checker_executable = "hdl_checker"
 
-        # Try to get the version before to catch potential issues
-        try:
-            _cmd = [hdl_checker_executable, "--version"]
-            self._logger.debug("Will run %s", " ".join(map(str, _cmd)))
-            self._logger.info(
-                "version: %s", subp.check_output(_cmd, stderr=subp.STDOUT)
+        path = resolveExecutable(hdl_checker_executable)
+        if path is None:
+            self._ui_queue.put(
+                [
+                    (
+                        "error",
+                        "Error while starting server: {} not found".format(
+                            hdl_checker_executable
+                        ),
+                    )
+                ]
             )
-        except (subp.CalledProcessError, FileNotFoundError) as exc:
-            #  self._postError()
-            vim_helpers.postVimError("Error while starting server: {}".format(exc))
             return
 
-        cmd = [
-            hdl_checker_executable,
-            "--host",
-            self._host,
-            "--port",
-            str(self._port),
-            "--stdout",
-            self._stdout,
-            "--stderr",
-            self._stderr,
-            "--attach-to-pid",
-            str(os.getpid()),
-            "--log-level",
-            self._log_level,
-            "--log-stream",
-            self._log_file,
-        ]
+        version = self._version_cache.get(path)
+        if version is None:
+            self._version_probe = self._version_cache.probeInBackground(path)
+            self._version_probe.add_done_callback(self._handleVersionProbe)
+        else:
+            self._version_probe = None
+            self._logger.info("version (cached): %s", version)
+
+        if self._transport == "unix":
+            # The socket showing up is how we tell the server is listening, so
+            # make sure it's not a leftover
+            if p.exists(self._socket_path):
+                os.remove(self._socket_path)
+            cmd = [path, "--unix-socket", self._socket_path]
+        else:
+            cmd = [
+                path,
+                "--host",
+                self._host,
+                "--port",
+                str(self._port),
+            ]
+
+        cmd += ["--stdout", self._stdout, "--stderr", self._stderr]
+
+        # Shared servers must outlive the Vim instance that started them
+        if self._shared is None:
+            cmd += ["--attach-to-pid", str(os.getpid())]
+
+        cmd += ["--log-level", self._log_level, "--log-stream", self._log_file]
+        cmd = self._limits.wrapCommand(cmd)
 
         self._logger.info(
             "Starting hdl_checker server with '%s'", " ".join(map(str, cmd))
         )
 
+        # Shared servers outlive the Vim instance that started them, which
+        # can't drain their output. They only write to the files passed via
+        # --stdout and --stderr
+        output = subp.PIPE if self._shared is None else subp.DEVNULL
+
         try:
             if _ON_WINDOWS:
                 self._server = subp.Popen(
                     cmd,
-                    stdout=subp.PIPE,
-                    stderr=subp.PIPE,
-                    creationflags=subp.CREATE_NEW_PROCESS_GROUP,
+                    stdout=output,
+                    stderr=output,
+                    creationflags=subp.CREATE_NEW_PROCESS_GROUP
+                    | self._limits.getCreationFlags(),
                 )
             else:
                 self._server = subp.Popen(
                     cmd,
-                    stdout=subp.PIPE,
-                    stderr=subp.PIPE,
-                    preexec_fn=os.setpgrp,
+                    stdout=output,
+                    stderr=output,
+                    start_new_session=True,
                 )
 
-            if not self._isServerAlive():
-                self._postError("Failed to launch hdl_checker server")
+            if output == subp.PIPE:
+                self._output.drain("stdout", self._server.stdout)
+                self._output.drain("stderr", self._server.stderr)
+
+            if self._server.poll() is not None:
+                self._ui_queue.put([("error", "Failed to launch hdl_checker server")])
         except subp.CalledProcessError:
             self._logger.exception("Error calling '%s'", " ".join(cmd))
 
-    def _waitForServerSetup(self):
+    def _handleVersionProbe(self, future):
+        try:
+            self._logger.info("version: %s", future.result())
+        except Exception as exc:  # pylint: disable=broad-except
+            self._logger.warning("Unable to get server version: %s", exc)
+
+    def _getStartupError(self):
         """
-        Wait for ~10s until the server is actually responding
+        Describes why the server didn't come up, using the version probe's
+        error if it ran and failed
         """
-        for _ in range(10):
-            time.sleep(0.2)
-            request = RequestHdlCheckerInfo()
-            response = request.sendRequest()
-            self._logger.debug(response)
-            if response:
-                self._logger.info("Ok, server is really up")
-                return
-            self._logger.info("Server is not responding yet")
+        if self._version_probe is not None:
+            try:
+                self._version_probe.result(_SERVER_PROBE_TIMEOUT)
+            except futures.TimeoutError:
+                pass
+            except Exception as exc:  # pylint: disable=broad-except
+                return "Error while starting server: {}".format(exc)
+        return "Unable to talk to server"
 
-        self._postError("Unable to talk to server")
+    def _waitForServerSetup(self, timeout=_SERVER_START_TIMEOUT):
+        """
+        Waits up to timeout seconds until the server is actually responding.
+        Returns True if the server has responded, False otherwise. The
+        server is probed as soon as it's listening (for Unix sockets, once
+        the socket file exists), backing off exponentially between attempts
+        """
+        deadline = time.monotonic() + timeout
+        delay = _SERVER_PROBE_MIN_DELAY
+
+        while True:
+            # No point in waiting if the server has already exited
+            if self._server is None or self._server.poll() is not None:
+                self._logger.info("Server has exited")
+                return False
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._logger.warning("Server didn't respond within %ss", timeout)
+                return False
+
+            if self._socket_path is None or p.exists(self._socket_path):
+                request = RequestHdlCheckerInfo()
+                # A server that accepts connections should respond quickly,
+                # don't let a single probe use up the time left
+                request.timeout = min(remaining, _SERVER_PROBE_TIMEOUT)
+                response = request.sendRequest()
+                self._logger.debug(response)
+                if response:
+                    self._logger.info("Ok, server is really up")
+                    return True
+                self._logger.info("Server is not responding yet")
+
+            time.sleep(min(delay, max(0, deadline - time.monotonic())))
+            delay = min(2 * delay, _SERVER_PROBE_MAX_DELAY)
 
     def shutdown(self):
         """
-        Kills the hdl_checker server
+        Stops sending requests and kills the hdl_checker server, unless it's
+        shared and other Vim instances are still using it
+        """
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._monitor.stop()
+        self._push = False
+        for subscription in list(self._subscriptions.values()):
+            if subscription is not None:
+                subscription.cancel()
+        self._executor.shutdown()
+        self._wakeup.close()
+
+        if self._shared is None:
+            self._killServer()
+            return
+
+        with self._shared.lock():
+            if self._shared.detach(os.getpid()):
+                self._killServer()
+            else:
+                BaseRequest.resetConnections()
+
+    def _killServer(self, graceful=True):
+        """
+        Stops the hdl_checker server. If graceful, the server is asked to
+        shut down so that it can save its state, then sent SIGTERM and only
+        killed if it's still running after that
         """
         if not self._isServerAlive():
             self._logger.warning("Server is not running")
             return
-        self._logger.debug("Sending shutdown signal")
-        os.kill(self._server.pid, 9)
-        self._server.terminate()
+        self._stopServer(self._server, graceful)
+        BaseRequest.resetConnections()
+        if self._socket_path is not None and p.exists(self._socket_path):
+            os.remove(self._socket_path)
         self._logger.debug("Done")
 
+    def _stopServer(self, server, graceful=True):
+        """
+        Makes server exit. If graceful, it's first asked to via a shutdown
+        request (if the server supports it) and then via SIGTERM, waiting up
+        to the shutdown timeout after each before killing it
+        """
+        if graceful:
+            request = RequestShutdown()
+            request.timeout = self._shutdown_timeout
+            if request.sendRequest() is not None and self._waitForExit(server):
+                self._logger.info("Server has shut down")
+                return
+
+            self._logger.debug("Sending terminate signal")
+            server.terminate()
+            if self._waitForExit(server):
+                return
+
+        self._logger.debug("Sending kill signal")
+        server.kill()
+
+    def _waitForExit(self, server):
+        try:
+            server.wait(self._shutdown_timeout)
+        except subp.TimeoutExpired:
+            self._logger.warning(
+                "Server still running after %ss", self._shutdown_timeout
+            )
+            return False
+        return True
+
     def _handleAsyncRequest(self, response):
         """
-        Callback passed to asynchronous requests
+        Callback passed to asynchronous requests. Responses are decoded here
+        so that only the messages go through the queue
         """
         if response is not None:
-            self._ui_queue.put(response)
+            self._ui_queue.put(response.json().get("ui_messages", []))
+
+    def _sendWithUiMessages(self, request, project_file):
+        """
+        Sends request and a request for UI messages in a single exchange and
+        posts the UI messages received. Returns the response to request. If
+        the server doesn't support batches, UI messages are requested in the
+        background instead so that Vim only waits for request
+        """
+        # Whether the server checks unsaved contents is only detected when
+        # the request is sent on its own
+        if BatchRequest.supported is False or isinstance(
+            request, RequestMessagesByContent
+        ):
+            response = request.sendRequest()
+            if project_file not in self._subscribed:
+                self._ui_requests.submit(
+                    project_file,
+                    RequestQueuedMessages(project_file=project_file),
+                    self._handleAsyncRequest,
+                )
+            self._postQueuedMessages()
+            return response
+
+        response, ui_response = BatchRequest(
+            request, RequestQueuedMessages(project_file=project_file)
+        ).sendRequest()
+        self._handleAsyncRequest(ui_response)
+        self._postQueuedMessages()
+        return response
+
+    def _subscribe(self, project_file):
+        """
+        Starts listening to events pushed by the server for project_file
+        """
+        if (
+            not self._push
+            or SubscribeEvents.supported is False
+            or project_file in self._subscriptions
+        ):
+            return
+        self._subscriptions[project_file] = None
+        self._whenReady(
+            self._startListening, project_file, key=("events", project_file)
+        )
+
+    def _startListening(self, project_file):
+        self._subscriptions[project_file] = BaseRequest.loop.run(
+            self._listen(project_file)
+        )
+
+    async def _listen(self, project_file):
+        """
+        Keeps the event stream for project_file open, reconnecting with a
+        backoff if the connection drops. UI messages are polled whenever the
+        stream is not open
+        """
+        delay = 0.5
+        try:
+            while self._push:
+                result = await SubscribeEvents(project_file).listen(
+                    self._handleServerEvent,
+                    on_open=lambda: self._subscribed.add(project_file),
+                )
+                self._subscribed.discard(project_file)
+                if result is False:
+                    break
+                if result:
+                    delay = 0.5
+                await asyncio.sleep(delay)
+                delay = min(2 * delay, 10)
+        finally:
+            self._subscribed.discard(project_file)
+            self._subscriptions.pop(project_file, None)
+
+    def _handleServerEvent(self, event):
+        """
+        Handles events pushed by the server, called from the event loop
+        thread
+        """
+        self._logger.debug("Event: %s", event)
+        kind = event.get("event", None)
+        if kind == "ui_messages":
+            self._ui_queue.put(event.get("ui_messages", []))
+        elif kind == "diagnostics_ready":
+            self._ready_paths.add(p.abspath(event["path"]))
+        else:
+            self._logger.warning("Unknown event: %s", event)
+            return
+        self._wakeup.wake()
+
+    def getWakeUpAddress(self):
+        """
+        Returns the address Vim should connect to in order to be woken up
+        when there are events to handle, or an empty string if that's not
+        possible
+        """
+        try:
+            return self._wakeup.start()
+        except Exception as exc:  # pylint: disable=broad-except
+            self._logger.warning("Unable to listen for Vim: %s", exc)
+            return ""
+
+    def handleServerEvents(self):
+        """
+        Posts UI messages pushed by the server. Returns True if the server has
+        reported new diagnostics for the current buffer
+        """
+        # Events arriving from now on should wake Vim up again
+        self._wakeup.clear()
+        self._postQueuedMessages()
+
+        if self._restarted:
+            # The new server knows nothing about the open buffers and
+            # diagnostics might have changed if the old one crashed midway
+            self._restarted = False
+            self._stored.clear()
+            self._cache.clear()
+            self.prefetchMessages()
+
+        path = p.abspath(vim.current.buffer.name)
+        return path in self._ready_paths or path in self._checked_paths
+
+    def needsEvents(self):
+        """
+        Checks if handleServerEvents needs to be called periodically, i.e.,
+        while the server is starting or has been restarted, or diagnostics
+        are being checked in the background or the server is pushing events
+        and Vim can't be woken up when they arrive
+        """
+        if self._stopped.is_set():
+            return False
+        if self._server_up is None or self._restarted:
+            return True
+        if self._wakeup.isConnected:
+            return False
+        return bool(self._server_up and (self._checking or self._subscribed))
 
     def _postQueuedMessages(self):
         """
@@ -258,7 +912,7 @@ class VimhdlClient:  # pylint: disable=too-many-instance-attributes
         """
         while not self._ui_queue.empty():
             messages = self._ui_queue.get()
-            for severity, message in messages.json().get("ui_messages", []):
+            for severity, message in messages:
                 if severity == "info":
                     vim_helpers.postVimInfo(message)
                 elif severity == "warning":
@@ -270,6 +924,51 @@ class VimhdlClient:  # pylint: disable=too-many-instance-attributes
                         "Unknown severity '%s' for message '%s'" % (severity, message)
                     )
 
+    def _newGeneration(self, path, generation):
+        """
+        Sets generation as the one diagnostics for path should match and
+        cancels queued requests for older generations
+        """
+        self._generations[path] = generation
+
+        self._executor.cancel(
+            lambda request: isinstance(request, RequestMessagesByPath)
+            and request.payload["path"] == path
+            and request.generation != generation
+        )
+
+        return generation
+
+    def _isStale(self, vim_buffer, path, generation):
+        """
+        Checks if diagnostics for generation have been superseded, either by
+        a newer request or by changes to the buffer itself
+        """
+        return (
+            self._generations.get(path, None) != generation
+            or vim_helpers.getBufferGeneration(vim_buffer) != generation
+        )
+
+    def _getCacheState(self, vim_buffer, project_file):
+        """
+        Returns a tuple with the generation of vim_buffer (see
+        vim_helpers.getBufferGeneration) and the state its diagnostics are
+        cached with, which also changes when project_file is modified
+        """
+        generation = vim_helpers.getBufferGeneration(vim_buffer)
+        return generation, generation + (vim_helpers.getModificationTime(project_file),)
+
+    def _acknowledgeReady(self, path):
+        """
+        Clears the reports that diagnostics of path are ready. Diagnostics the
+        server reported as new must not come from the cache, so they're
+        evicted
+        """
+        if path in self._ready_paths:
+            self._ready_paths.discard(path)
+            self._cache.evict(path)
+        self._checked_paths.discard(path)
+
     def getMessages(self, vim_buffer=None, vim_var=None):
         """
         Returns a list of messages to populate the quickfix list. For
@@ -287,61 +986,377 @@ class VimhdlClient:  # pylint: disable=too-many-instance-attributes
 
         project_file = vim_helpers.getProjectFile()
         path = p.abspath(vim_buffer.name)
+        generation, state = self._getCacheState(vim_buffer, project_file)
+        self._acknowledgeReady(path)
+
+        messages = self._cache.get(path, state)
+        if messages is not None:
+            self._logger.debug("Using cached messages for %s", path)
+            self._postQueuedMessages()
+        elif not self.isServerReady():
+            # Answer with no messages for now, handleServerEvents will report
+            # once the server has checked the buffer
+            self._logger.info("Server is not ready, deferring %s", path)
+            self._postQueuedMessages()
+            self._checkInBackground(
+                vim_buffer,
+                project_file,
+                path,
+                generation,
+                state,
+                content=self._getUnsavedContent(vim_buffer),
+            )
+            messages = []
+        else:
+            messages = self._requestMessages(
+                vim_buffer,
+                project_file,
+                path,
+                self._newGeneration(path, generation),
+                content=self._getUnsavedContent(vim_buffer),
+            )
+            if messages is None:
+                return
+            self._cache.put(path, state, messages)
 
-        request = RequestMessagesByPath(project_file=project_file, path=path)
+        if vim_var is None:
+            return [x.toDict() for x in messages]
 
-        response = request.sendRequest()
+        vim_helpers.toVimList([x.toDict() for x in messages], vim_var)
+
+    def _requestMessages(  # pylint: disable=too-many-arguments
+        self, vim_buffer, project_file, path, generation, content=None
+    ):
+        """
+        Requests messages for path, sending the version of the last result
+        so that the server can reply with only what changed. Returns sorted
+        location list entries or None if the request failed or its result
+        is outdated. If content is set, messages are for it instead of the
+        saved file and are not kept for applying changes later. Servers that
+        can't check unsaved contents get a request for the saved file
+        """
+        if content is not None:
+            stored = None
+            request = RequestMessagesByContent(
+                project_file=project_file,
+                path=path,
+                content=content,
+                generation=generation,
+            )
+        else:
+            stored = self._stored.get(path, None)
+            request = RequestMessagesByPath(
+                project_file=project_file,
+                path=path,
+                generation=generation,
+                since=None if stored is None else stored[0],
+            )
+
+        response = self._sendWithUiMessages(request, project_file)
         if response is None:
-            return
+            if content is not None and RequestMessagesByContent.supported is False:
+                return self._requestMessages(vim_buffer, project_file, path, generation)
+            return None
+
+        if self._isStale(vim_buffer, path, generation):
+            self._logger.info("Dropping outdated messages for %s", path)
+            return None
+
+        if content is not None:
+            return _toEntries(
+                response.json().get("messages", []),
+                str(vim_buffer.number),
+                vim_buffer.name,
+            )
+
+        messages = self._updateMessages(vim_buffer, path, response.json())
+        if messages is None:
+            self._stored.pop(path, None)
+            if stored is None:  # pragma: no cover
+                self._logger.warning("Got changes for %s without a version", path)
+                return None
+            # Changes don't apply to what we have, start over
+            self._logger.info("Unexpected version for %s, requesting all", path)
+            return self._requestMessages(vim_buffer, project_file, path, generation)
 
-        messages = []
-        for msg in response.json().get("messages", []):
-            _logger.info("msg:\n%s", pformat(msg))
-            text = str(msg["text"]) if msg["text"] else ""
-            vim_fmt_dict = {
-                "lnum": int(msg.get("line_number", 0)) + 1,
-                "bufnr": str(vim_buffer.number),
-                "filename": msg.get("filename", None) or vim_buffer.name,
-                "valid": "1",
-                "text": text,
-                "nr": msg.get("error_code", None) or "0",
-                "type": msg.get("severity", None) or "E",
-                "col": int(msg.get("column_number", 0)) + 1,
-            }
+        return messages
+
+    def _updateMessages(self, vim_buffer, path, content):
+        """
+        Updates the location list entries stored for path with the server's
+        response, which contains either all messages or the messages added
+        and removed since the version given. Returns all sorted entries or
+        None if the changes are relative to a version other than the one
+        stored
+        """
+        version = content.get("version", None)
+        bufnr = str(vim_buffer.number)
+
+        # Without a version there's nothing to apply changes to later, so
+        # there's no need to store the entries
+        if version is None and "messages" in content:
+            self._stored.pop(path, None)
+            return _toEntries(content["messages"], bufnr, vim_buffer.name)
+
+        if "messages" in content:
+            entries = {}
+            added = content["messages"]
+            removed = ()
+        else:
+            stored = self._stored.get(path, None)
+            if stored is None or stored[0] != content.get("since", None):
+                return None
+            entries = stored[1]
+            added = content.get("added", ())
+            removed = content.get("removed", ())
+
+        for msg in removed:
+            key = _messageKey(msg)
             try:
-                vim_fmt_dict["subtype"] = str(msg["error_subtype"])
+                entries[key].pop()
+                if not entries[key]:
+                    del entries[key]
             except KeyError:
-                pass
+                self._logger.warning("Removed message not found: %s", msg)
+
+        for msg in added:
+            entries.setdefault(_messageKey(msg), []).append(
+                LoclistEntry.fromMessage(msg, bufnr, vim_buffer.name)
+            )
 
-            _logger.info(vim_fmt_dict)
-            messages.append(vim_fmt_dict)
+        if version is None:
+            self._stored.pop(path, None)
+        else:
+            self._stored[path] = (version, entries)
 
-        self.requestUiMessages("getMessages")
+        return sortEntries([x for same in entries.values() for x in same])
 
-        if vim_var is None:
-            return _sortBuildMessages(messages)
+    def _getUnsavedContent(self, vim_buffer):
+        """
+        Returns the contents of vim_buffer if checking as you type, the server
+        can check unsaved contents and the buffer has unsaved changes, None
+        otherwise
+        """
+        if not self._check_as_you_type or RequestMessagesByContent.supported is False:
+            return None
+        if not vim_helpers.getIntValue(
+            "getbufvar({}, '&modified')".format(vim_buffer.number)
+        ):
+            return None
+        return "\n".join(vim_buffer[:])
+
+    def checkBuffer(self):
+        """
+        Checks the current buffer's contents in the background. The result is
+        cached and handleServerEvents will report it's ready. Queued checks
+        of previous contents are cancelled and results of checks that were
+        already in flight are dropped. Does nothing if the server can't check
+        unsaved contents
+        """
+        if (
+            not self._check_as_you_type
+            or RequestMessagesByContent.supported is False
+            or not self._isServerAlive()
+        ):
+            return
+
+        vim_buffer = vim.current.buffer
+        project_file = vim_helpers.getProjectFile()
+        path = p.abspath(vim_buffer.name)
+        generation, state = self._getCacheState(vim_buffer, project_file)
+
+        if self._cache.get(path, state) is not None:
+            return
+
+        self._checkInBackground(
+            vim_buffer,
+            project_file,
+            path,
+            generation,
+            state,
+            content="\n".join(vim_buffer[:]),
+        )
+
+    def _checkInBackground(  # pylint: disable=too-many-arguments
+        self, vim_buffer, project_file, path, generation, state, content=None
+    ):
+        """
+        Requests messages for path (or content, if set) in the background,
+        results are cached with state and path is added to the paths
+        handleServerEvents reports
+        """
+        bufnr, filename = str(vim_buffer.number), vim_buffer.name
+
+        if content is None:
+            request = RequestMessagesByPath(
+                project_file=project_file,
+                path=path,
+                generation=self._newGeneration(path, generation),
+            )
+        else:
+            request = RequestMessagesByContent(
+                project_file=project_file,
+                path=path,
+                content=content,
+                generation=self._newGeneration(path, generation),
+            )
+        self._checking[path] = generation
+
+        def handleResponse(response):
+            # Called from the event loop thread, so Vim can't be used here
+            if self._checking.get(path, None) == generation:
+                del self._checking[path]
+            if response is None or self._generations.get(path, None) != generation:
+                return
+            self._cache.put(
+                path,
+                state,
+                _toEntries(response.json().get("messages", []), bufnr, filename),
+            )
+            self._checked_paths.add(path)
+            self._wakeup.wake()
+
+        self._whenReady(
+            self._executor.submit, request, handleResponse, key=("check", path)
+        )
+
+    def requestDiagnostics(self):
+        """
+        Shows diagnostics of the current buffer via the native renderer.
+        Cached diagnostics are shown right away, otherwise they're requested
+        in the background and handleServerEvents reports once they're ready,
+        so Vim never waits for the server
+        """
+        if not self._isServerAlive():
+            return
 
-        for msg in _sortBuildMessages(messages):
-            vim_helpers.toVimDict(msg, "_dict")
-            vim.command("let {0} += [{1}]".format(vim_var, "_dict"))
-            vim.command("unlet! _dict")
+        vim_buffer = vim.current.buffer
+        project_file = vim_helpers.getProjectFile()
+        path = p.abspath(vim_buffer.name)
+        generation, state = self._getCacheState(vim_buffer, project_file)
+        self._acknowledgeReady(path)
+
+        entries = self._cache.get(path, state)
+        if entries is None:
+            self._checkInBackground(
+                vim_buffer,
+                project_file,
+                path,
+                generation,
+                state,
+                content=self._getUnsavedContent(vim_buffer),
+            )
+            return
+
+        self._postQueuedMessages()
+        vim_helpers.toVimList([x.toDict() for x in entries], "l:items")
+        vim.command("call vimhdl#render#apply({}, l:items)".format(vim_buffer.number))
+
+    def prefetchMessages(self, buffer_numbers=None):
+        """
+        Requests messages for HDL buffers (all buffers if buffer_numbers is
+        None) whose diagnostics are not cached in a single exchange per
+        project file, so that checking them later doesn't need to wait for
+        the server. Buffers with unsaved changes are skipped. Requests are
+        sent in the background
+        """
+        if not self._isServerAlive():
+            return
+
+        if buffer_numbers is None:
+            vim_buffers = list(vim.buffers)
+        else:
+            vim_buffers = []
+            for number in buffer_numbers:
+                # Buffers might have been wiped since they were written
+                try:
+                    vim_buffers.append(vim.buffers[int(number)])
+                except KeyError:
+                    self._logger.debug("Buffer %s doesn't exist anymore", number)
+
+        by_project = {}
+        for vim_buffer in vim_buffers:
+            if not vim_buffer.name or not vim_buffer.name.endswith(_HDL_EXTENSIONS):
+                continue
+            if vim_helpers.getIntValue(
+                "getbufvar({}, '&modified')".format(vim_buffer.number)
+            ):
+                continue
+            project_file = vim_helpers.getProjectFile(vim_buffer)
+            path = p.abspath(vim_buffer.name)
+            generation, state = self._getCacheState(vim_buffer, project_file)
+            if self._cache.get(path, state) is not None:
+                continue
+            self._newGeneration(path, generation)
+            by_project.setdefault(project_file, []).append(
+                (path, generation, state, str(vim_buffer.number), vim_buffer.name)
+            )
+
+        for project_file, items in by_project.items():
+            self._logger.info("Prefetching messages for %d paths", len(items))
+            self._whenReady(
+                self._executor.submit,
+                RequestMessagesByPaths(
+                    project_file=project_file, paths=[x[0] for x in items]
+                ),
+                lambda responses, items=items: self._handlePrefetch(items, responses),
+                key=("prefetch", project_file, tuple(x[0] for x in items)),
+            )
+
+    def _handlePrefetch(self, items, responses):
+        """
+        Caches messages received for prefetched paths, called from the event
+        loop thread
+        """
+        if responses is None:
+            return
+        for (path, generation, state, bufnr, filename), response in zip(
+            items, responses
+        ):
+            if response is None or self._generations.get(path, None) != generation:
+                continue
+            self._cache.put(
+                path,
+                state,
+                _toEntries(response.json().get("messages", []), bufnr, filename),
+            )
+
+    def clearCache(self, path=None):
+        """
+        Drops cached diagnostics for path or for all paths if path is None
+        """
+        if path is None:
+            self._cache.clear()
+        else:
+            self._cache.evict(p.abspath(path))
+            self._stored.pop(p.abspath(path), None)
 
     def requestUiMessages(self, event):
         """Retrieves UI messages from the server and post them with the
-        appropriate severity level"""
+        appropriate severity level. Returns needsEvents()"""
         self._logger.info(
             "Handling event '%s'. Filetype is %s", event, vim.eval("&filetype")
         )
         self._postQueuedMessages()
 
         if not self._isServerAlive():
-            return
+            return False
 
         project_file = vim_helpers.getProjectFile()
 
-        request = RequestQueuedMessages(project_file=project_file)
+        # Messages will be pushed by the server
+        self._subscribe(project_file)
+        if project_file not in self._subscribed:
+            request = RequestQueuedMessages(project_file=project_file)
+            self._whenReady(
+                self._ui_requests.submit,
+                project_file,
+                request,
+                self._handleAsyncRequest,
+                key=("messages", project_file),
+            )
 
-        request.sendRequestAsync(self._handleAsyncRequest)
+        return self.needsEvents()
 
     def getVimhdlInfo(self):
         """
@@ -350,17 +1365,34 @@ class VimhdlClient:  # pylint: disable=too-many-instance-attributes
         project_file = vim_helpers.getProjectFile()
         request = RequestHdlCheckerInfo(project_file=project_file)
 
-        response = request.sendRequest()
-
         info = ["vimhdl version: %s" % vimhdl.__version__]
 
+        if self._server_up is None and self._isServerAlive():
+            response = None
+            info += ["hdl_checker server is starting"]
+        else:
+            response = request.sendRequest()
+            if response is None:
+                info += ["hdl_checker server is not running"]
+
         if response is not None:
             # The server has responded something, so just print it
-            self._logger.info("Response: %s", str(response.json()["info"]))
+            server_info = response.json()["info"]
+            self._logger.info("Response: %s", str(server_info))
 
-            info += response.json()["info"]
-        else:
-            info += ["hdl_checker server is not running"]
+            info += server_info
+
+        if self._server is not None and self._server.poll() is None:
+            info += self._limits.describe(self._server.pid)
+
+        if self._shared is not None:
+            shared_info = self._shared.getInfo() or {}
+            info += [
+                "Shared server: {} (Vim instances: {})".format(
+                    self._shared.filename,
+                    ", ".join(map(str, shared_info.get("clients", []))),
+                )
+            ]
 
         info += [
             "Server logs: " + self._log_file,
@@ -368,6 +1400,14 @@ class VimhdlClient:  # pylint: disable=too-many-instance-attributes
             "Server stderr: " + self._stderr,
         ]
 
+        samples = self._monitor.describe()
+        if samples:
+            info += ["\n  ".join(["Server resources:"] + samples)]
+
+        output = self._output.getLines(_SERVER_OUTPUT_INFO_LINES)
+        if output:
+            info += ["\n  ".join(["Server output (last lines):"] + output)]
+
         _logger.info("info: %s", info)
         return "\n".join(["- " + str(x) for x in info])
 
@@ -380,9 +1420,15 @@ class VimhdlClient:  # pylint: disable=too-many-instance-attributes
             return
 
         vim_helpers.postVimInfo("Rebuilding project...")
+        self._cache.clear()
+        self._stored.clear()
         project_file = vim_helpers.getProjectFile()
         request = RequestProjectRebuild(project_file=project_file)
 
+        if not self.isServerReady():
+            self._whenReady(self._executor.submit, request)
+            return None
+
         response = request.sendRequest()
 
         if response is None:
@@ -399,19 +1445,23 @@ class VimhdlClient:  # pylint: disable=too-many-instance-attributes
         if not self._isServerAlive():
             return
 
+        if not self.isServerReady():
+            return "hdl_checker server is starting, try again in a moment"
+
         project_file = vim_helpers.getProjectFile()
 
         request = GetDependencies(
             project_file=project_file, path=vim.current.buffer.name
         )
 
-        response = request.sendRequest()
+        response = self._sendWithUiMessages(request, project_file)
         if response is not None:
-            self._logger.debug("Response: %s", str(response.json()["dependencies"]))
+            dependencies = response.json()["dependencies"]
+            self._logger.debug("Response: %s", str(dependencies))
 
             return "\n".join(
                 ["Dependencies for %s" % vim.current.buffer.name]
-                + ["- %s" % x for x in sorted(response.json()["dependencies"])]
+                + ["- %s" % x for x in sorted(dependencies)]
             )
 
         return "Source has no dependencies"
@@ -425,17 +1475,20 @@ class VimhdlClient:  # pylint: disable=too-many-instance-attributes
         if not self._isServerAlive():
             return
 
+        if not self.isServerReady():
+            return "hdl_checker server is starting, try again in a moment"
+
         project_file = vim_helpers.getProjectFile()
 
         request = GetBuildSequence(
             project_file=project_file, path=vim.current.buffer.name
         )
 
-        response = request.sendRequest()
+        response = self._sendWithUiMessages(request, project_file)
         if response is not None:
-            self._logger.debug("Response: %s", str(response.json()["sequence"]))
-
             sequence = response.json()["sequence"]
+            self._logger.debug("Response: %s", str(sequence))
+
             if sequence:
                 i = 1
                 msg = ["Build sequence for %s\n" % vim.current.buffer.name]
@@ -454,6 +1507,9 @@ class VimhdlClient:  # pylint: disable=too-many-instance-attributes
         """
         paths = vim.eval("b:local_arg") or ["."]
 
+        # The server has just been started when creating the project file
+        self._setup_done.wait(_SERVER_START_TIMEOUT)
+
         request = RunConfigGenerator(generator="SimpleFinder", paths=paths)
         response = request.sendRequest()
         if response is None:
@@ -16,10 +16,14 @@
 # along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
 "Misc helpers for common vim-hdl operations"
 
+import errno
 import json
 import logging
+import os
 import os.path as p
 import socket
+import stat
+import tempfile
 
 import vim  # type: ignore # pylint: disable=import-error
 
@@ -71,6 +75,52 @@ def toVimDict(obj, vim_variable):
         vim.command("let {0}['{1}'] = '{2}'".format(vim_variable, key, value))
 
 
+# Whether Vim has json_decode(), checked on first use
+_HAS_JSON_DECODE = None
+
+
+def _hasJsonDecode():
+    """
+    Checks if Vim has json_decode() (Vim 7.4.1304+ and Neovim)
+    """
+    global _HAS_JSON_DECODE  # pylint: disable=global-statement
+    if _HAS_JSON_DECODE is None:
+        _HAS_JSON_DECODE = vim.eval("exists('*json_decode')") == "1"
+    return _HAS_JSON_DECODE
+
+
+def toVimList(objs, vim_variable):
+    """
+    Appends the dicts in objs to the Vim list vim_variable. Values are
+    converted to strings, same as toVimDict does. The entire list is handed
+    to Vim as a JSON encoded single quoted string, where only single quotes
+    need escaping, so it takes a single Ex command regardless of how many
+    items there are. Falls back to toVimDict when json_decode() is not
+    available
+    """
+    if not _hasJsonDecode():
+        for obj in objs:
+            toVimDict(obj, "_dict")
+            vim.command("let {0} += [{1}]".format(vim_variable, "_dict"))
+        vim.command("unlet! _dict")
+        return
+
+    items = [
+        {
+            _toUnicode(key): _toUnicode(value)
+            if isinstance(value, (str, bytes))
+            else str(value)
+            for key, value in obj.items()
+        }
+        for obj in objs
+    ]
+    vim.command(
+        "let {0} += json_decode('{1}')".format(
+            vim_variable, json.dumps(items).replace("'", "''")
+        )
+    )
+
+
 def postVimInfo(message):
     """
     These were "Borrowed" from YCM.
@@ -121,6 +171,42 @@ def getUnusedLocalhostPort():
     return port
 
 
+def getRuntimeDir():
+    """
+    Returns a directory only the current user has access to for sockets
+    and other files that don't outlive the session. Raises OSError if the
+    directory exists but is not private, e.g. if it was created by another
+    user
+    """
+    base_dir = os.environ.get("XDG_RUNTIME_DIR", None) or tempfile.gettempdir()
+    runtime_dir = p.join(base_dir, "vimhdl-{}".format(os.getuid()))
+    os.makedirs(runtime_dir, mode=0o700, exist_ok=True)
+
+    # The mode is only set if the directory didn't exist
+    info = os.lstat(runtime_dir)
+    if (
+        not stat.S_ISDIR(info.st_mode)
+        or info.st_uid != os.getuid()
+        or info.st_mode & 0o077
+    ):
+        raise PermissionError(
+            errno.EACCES,
+            "Runtime directory is not private to the current user",
+            runtime_dir,
+        )
+    return runtime_dir
+
+
+def getUnixSocketPath(name=None):
+    """
+    Returns a path for a Unix socket, unique for this Vim instance unless
+    name is set
+    """
+    if name is None:
+        name = "server_pid{}".format(os.getpid())
+    return p.join(getRuntimeDir(), name + ".sock")
+
+
 # Methods of accessing g: and b: work only with Vim 7.4+
 
 
@@ -144,13 +230,16 @@ def _getBufferVars(vbuffer=None, var=None):
     return vbuffer.vars[var]
 
 
-def getProjectFile():
+def getProjectFile(vim_buffer=None):
     """
     Searches for a valid HDL Checker configuration file in buffer vars (i.e.,
-    inside b:) then in global vars (i.e., inside g:)
+    inside b:) of vim_buffer (the current buffer if it's None) then in global
+    vars (i.e., inside g:)
     """
-    if "vimhdl_conf_file" in _getBufferVars():
-        conf_file = p.abspath(p.expanduser(_getBufferVars(var="vimhdl_conf_file")))
+    if "vimhdl_conf_file" in _getBufferVars(vim_buffer):
+        conf_file = p.abspath(
+            p.expanduser(_getBufferVars(vim_buffer, var="vimhdl_conf_file"))
+        )
         if p.exists(p.dirname(conf_file)) and p.exists(conf_file):
             return conf_file
 
@@ -167,6 +256,27 @@ def getProjectFile():
     return None
 
 
+def getBufferGeneration(vim_buffer):
+    """
+    Returns a value that changes whenever the buffer is edited (via
+    b:changedtick) or written (via the file's modification time)
+    """
+    changedtick = getIntValue("getbufvar({}, 'changedtick')".format(vim_buffer.number))
+    return changedtick, getModificationTime(vim_buffer.name)
+
+
+def getModificationTime(path):
+    """
+    Returns the modification time of path or None if it can't be read
+    """
+    if path is None:
+        return None
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
 # See YouCompleteMe/python/ycm/vimsupport.py
 def getIntValue(variable):
     return int(vim.eval(variable))
@@ -0,0 +1,102 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Wakes Vim up when there are events to handle. Vim can't be used from other
+threads, so instead of Vim polling for events, it connects to a local socket
+(via ch_open on Vim and sockconnect on Neovim) and gets a line written to it
+whenever there's something to handle
+"""
+
+import asyncio
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Seconds to wait for the socket to be listening
+_START_TIMEOUT = 5
+
+
+class WakeUpServer(object):  # pylint: disable=useless-object-inheritance
+    """
+    Local TCP server Vim connects to, running on the EventLoopThread loop
+    """
+
+    def __init__(self, loop):
+        self._loop = loop
+        self._server = None
+        self._writers = []
+        self._pending = False
+        self.address = None
+
+    def start(self):
+        """
+        Starts listening if not already, returns the address Vim should
+        connect to, as host:port
+        """
+        if self.address is None:
+            self._server = self._loop.run(
+                asyncio.start_server(self._accept, "127.0.0.1", 0)
+            ).result(_START_TIMEOUT)
+            host, port = self._server.sockets[0].getsockname()[:2]
+            self.address = "{}:{}".format(host, port)
+            _logger.info("Listening for Vim on %s", self.address)
+        return self.address
+
+    async def _accept(self, reader, writer):
+        self._writers.append(writer)
+        try:
+            # Nothing is expected from Vim, just wait for it to go away
+            while await reader.read(1024):
+                pass
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self._writers.remove(writer)
+            writer.close()
+
+    @property
+    def isConnected(self):
+        "Checks if Vim is listening for wake ups"
+        return bool(self._writers)
+
+    def wake(self):
+        """
+        Wakes Vim up, can be called from any thread. Wake ups are coalesced
+        until Vim calls clear
+        """
+        self._loop.callSoon(self._wake)
+
+    def _wake(self):
+        if self._pending:
+            return
+        self._pending = True
+        for writer in self._writers:
+            writer.write(b"wake\n")
+
+    def clear(self):
+        "Called by Vim before handling events"
+        self._pending = False
+
+    def close(self):
+        "Stops listening and closes connections to Vim"
+        if self._server is not None:
+            self._loop.callSoon(self._close)
+
+    def _close(self):
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
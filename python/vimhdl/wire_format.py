@@ -0,0 +1,110 @@
+# This file is part of vim-hdl.
+#
+# Copyright (c) 2015-2016 Andre Souto
+#
+# vim-hdl is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# vim-hdl is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with vim-hdl.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Encoding of request payloads and decoding of server responses
+"""
+
+import json
+import logging
+import zlib
+from urllib.parse import urlencode
+
+try:
+    import msgpack  # type: ignore
+except ImportError:
+    msgpack = None
+
+_logger = logging.getLogger(__name__)
+
+FORM = "form"
+JSON = "json"
+MSGPACK = "msgpack"
+
+# Formats in order of preference. If the server rejects a format, the next one
+# is used
+_FALLBACK = {MSGPACK: JSON, JSON: FORM}
+
+_CONTENT_TYPES = {JSON: "application/json", MSGPACK: "application/x-msgpack"}
+
+# Request bodies larger than this (in bytes) are compressed
+COMPRESS_THRESHOLD = 4096
+
+
+def isAvailable(wire_format):
+    """
+    Checks if wire_format can be used
+    """
+    if wire_format == MSGPACK:
+        return msgpack is not None
+    return wire_format in (FORM, JSON)
+
+
+def getFallback(wire_format):
+    """
+    Format to try when the server doesn't accept wire_format
+    """
+    return _FALLBACK.get(wire_format, FORM)
+
+
+def getAcceptHeader():
+    """
+    Response formats the client can decode
+    """
+    if msgpack is None:
+        return "application/json"
+    return "application/x-msgpack, application/json;q=0.9"
+
+
+def encode(payload, wire_format, compress=True):
+    """
+    Encodes payload, returning a tuple with the headers to add to the request
+    and the body. Lists and dicts of form encoded payloads are JSON encoded
+    and None values are omitted
+    """
+    if wire_format == FORM:
+        fields = []
+        for key, value in payload.items():
+            if isinstance(value, (list, tuple, dict)):
+                value = json.dumps(value)
+            if value is not None:
+                fields.append((key, value))
+        body = urlencode(fields).encode("utf-8")
+        return {"Content-Type": "application/x-www-form-urlencoded"}, body
+
+    if wire_format == MSGPACK:
+        body = msgpack.packb(payload, use_bin_type=True)
+    else:
+        body = json.dumps(payload).encode("utf-8")
+
+    headers = {"Content-Type": _CONTENT_TYPES[wire_format]}
+
+    if compress and len(body) > COMPRESS_THRESHOLD:
+        body = zlib.compress(body)
+        headers["Content-Encoding"] = "deflate"
+
+    return headers, body
+
+
+def decode(content_type, body):
+    """
+    Decodes a response body according to its content type
+    """
+    if msgpack is not None and (content_type or "").startswith(
+        _CONTENT_TYPES[MSGPACK]
+    ):
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body.decode("utf-8"))